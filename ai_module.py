@@ -1,48 +1,207 @@
 import chess
-import chess.svg
-import chess.pgn  
-import base64
-import os
-import random
-import json
-from langchain_groq import ChatGroq
-import time
 import re
 import logging
-from io import StringIO, BytesIO 
-from utils import set_custom_css, display_header
+import os
+import time
+import copy
+import hashlib
+import threading
+import uuid
+from cassette import configured_llm, exchange
+from move_index import MoveIndex, board_matrix
+from ranker import rank_moves, candidates_str
+from endgame import shared_tables
+from json_stream import JsonArrayStream
+from singleflight import shared_flights
+
+PREWARM_PROMPT = "Reply with the single word: ready."
+# Part of the key for merging identical requests; bump it whenever a prompt template changes
+PROMPT_VERSION = 1
 
 class AIModule:
-    def __init__(self, st, model="llama-3.1-8b-instant", temperature=0.1, max_tokens=700):
+    # How many engine-ranked candidates each kind of prompt lists; 0 or None lists every legal move
+    CANDIDATE_K = {'Chess Playing': 8, 'Chess Teaching': 12, 'Suggestions': 10}
+
+    def __init__(self, st, model="llama-3.1-8b-instant", temperature=0.1, max_tokens=700, llm=None,
+                 base_url=None, candidate_k=None, ranker_depth=1, router=None, use_endgame_tables=True,
+                 coalesce=True, api_key=None):
+        self.st = st
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.base_url = base_url
+        self.api_key = api_key
+        self.candidate_k = dict(self.CANDIDATE_K, **(candidate_k or {}))
+        self.ranker_depth = ranker_depth
+        # With a ModelRouter each request may go to a different model; clients are created on first use
+        self.router = router
+        self.llms = {}
+        # Guards `llms`, which the prewarm and worker threads fill alongside the script thread
+        self.llm_lock = threading.Lock()
+        # Positions covered by the endgame tables are answered locally, without the LLM
+        self.endgame = shared_tables() if use_endgame_tables else None
+        # Identical requests in flight at the same time, from any session, share one call
+        self.flights = shared_flights() if coalesce else None
+        # Only requests that would reach the same endpoint with the same key and settings are merged;
+        # an injected client is only shared with itself
+        if llm is not None:
+            self.flight_client = id(llm)
+        else:
+            credential = hashlib.sha256((api_key or os.environ.get('GROQ_API_KEY', '')).encode()).hexdigest()
+            self.flight_client = (base_url, credential, temperature, max_tokens)
+        # Tags recorded exchanges (see cassette.py); kept by headless copies, which act for the same session
+        self.session_id = uuid.uuid4().hex[:8]
+        self.stats = {'requests': 0, 'invalid_moves': 0, 'errors': 0, 'fallbacks': 0, 'endgame_moves': 0}
+        if llm is not None:
+            # Any object with an `invoke(messages)` returning `.content` can stand in for ChatGroq
+            self.llm = llm
+            return
+        if router is not None:
+            self.llm = None
+            return
         try:
-            self.st = st
-            self.llm = ChatGroq(
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
+            self.llm = self.create_llm(model)
         except Exception as e:
             self.st.error(f"Failed to initialize ChatGroq model: {e}")
             self.st.stop()
 
-    def get_ai_move(self, board, color, mode, max_retries=3):
+    def headless_copy(self):
+        """A copy for worker threads: same clients and router, but messages go to a HeadlessStreamlit."""
+        from headless import HeadlessStreamlit
+        worker = copy.copy(self)
+        worker.st = HeadlessStreamlit(keep_messages=False)
+        worker.stats = dict.fromkeys(self.stats, 0)
+        return worker
+
+    def create_llm(self, model):
+        """A ChatGroq client, recorded to or replayed from a cassette when LLM_CASSETTE is set (see cassette.py)."""
+        def create():
+            # Imported here so the LLM stack is only loaded once a model has been chosen
+            from langchain_groq import ChatGroq
+            # Without a key of its own, ChatGroq falls back to GROQ_API_KEY
+            credentials = {'api_key': self.api_key} if self.api_key else {}
+            return ChatGroq(
+                model=model,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                base_url=self.base_url,
+                **credentials
+            )
+
+        return configured_llm(model, create)
+
+    def llm_for(self, model):
+        """The client for `model`; an injected llm serves every model."""
+        if self.llm is not None:
+            return self.llm
+        with self.llm_lock:
+            if model not in self.llms:
+                self.llms[model] = self.create_llm(model)
+            return self.llms[model]
+
+    def prewarm(self):
+        """
+        Send a tiny request to the model the first move will most likely use, on a background
+        thread, so DNS, TLS and the provider's cold start are paid before the game starts.
+        Its latency is not recorded with the router. Returns the thread.
+        """
+        model = self.choose_model(chess.Board(), 'Chess Playing')
+
+        def warm():
+            started = time.perf_counter()
+            try:
+                with exchange(self.session_id, 'prewarm'):
+                    self.llm_for(model).invoke([("system", PREWARM_PROMPT)])
+                logging.info(f"Pre-warmed {model} in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                logging.warning(f"Pre-warming {model} failed: {e}")
+
+        thread = threading.Thread(target=warm, name='llm-prewarm', daemon=True)
+        thread.start()
+        return thread
+
+    def choose_model(self, board, mode, time_left=None, exclude=()):
+        if self.router is None:
+            return self.model
+        model = self.router.choose(board, mode, time_left=time_left, exclude=exclude)
+        logging.info(f"Router chose {model} (Mode: {mode})")
+        return model
+
+    def record_outcome(self, model, started, error=False, legal=True):
+        if self.router is not None:
+            self.router.record(model, time.perf_counter() - started, error=error, legal=legal)
+
+    def complete(self, model, prompt, on_text=None, mode=None):
+        """
+        Send `prompt` to `model` and return the response text. With `on_text`, the response is
+        streamed when the client supports it and `on_text(text_so_far)` is called as tokens arrive.
+        A request identical to one already in flight waits for that one's response instead.
+        """
+        if self.flights is None:
+            return self.request_completion(model, prompt, on_text)
+        # The prompt holds the position, side and feedback
+        key = (mode, model, PROMPT_VERSION, self.flight_client, hashlib.sha1(prompt.encode()).hexdigest())
+        return self.flights.do(key, lambda publish: self.request_completion(model, prompt, publish), on_text)
+
+    def request_completion(self, model, prompt, on_text=None):
+        llm = self.llm_for(model)
+        if on_text is None or not hasattr(llm, 'stream'):
+            content = llm.invoke([("system", prompt)]).content
+            if on_text is not None:
+                on_text(content)
+            return content
+        started = time.perf_counter()
+        text = ""
+        for chunk in llm.stream([("system", prompt)]):
+            if not chunk.content:
+                continue
+            if not text:
+                logging.info(f"First token from {model} after {time.perf_counter() - started:.2f}s")
+            text += chunk.content
+            on_text(text)
+        return text
+
+    def move_index_for(self, board, move_index=None):
+        """Use the caller's per-ply MoveIndex when given, otherwise build one for this board."""
+        return move_index if move_index is not None else MoveIndex(board)
+
+    def moves_prompt_line(self, move_index, prompt_kind):
+        """
+        The prompt line listing the moves to choose from: the top-k moves from the local ranker
+        with their scores, or every legal move when ranking is disabled for this kind of prompt.
+        """
+        k = self.candidate_k.get(prompt_kind)
+        if not k:
+            return f"**Available Legal Moves:** {move_index.legal_moves_str}"
+        ranked = rank_moves(move_index, self.ranker_depth)
+        return f"**Candidate Moves (engine evaluation in pawns, best first):** {candidates_str(ranked, k)}"
+
+    def get_ai_move(self, board, color, mode, max_retries=3, move_index=None, time_left=None, on_text=None):
         """
         Get the AI's move using ChatGroq.
         The AI is prompted differently based on the selected mode.
+        `time_left` is the mover's remaining clock in seconds, used when routing between models.
+        `on_text(text_so_far)` receives the response as it streams in, starting over on each attempt.
         """
+        table_move = self.get_endgame_move(board, mode)
+        if table_move:
+            return table_move
+
         previous_invalid_move = None
+        failed_models = set()
+        request_id = uuid.uuid4().hex[:8]
+        # Recorded with each exchange so the request can be reproduced from a cassette
+        position = {'fen': board.fen(), 'mode': mode, 'color': 'white' if color == chess.WHITE else 'black'}
 
-        legal_moves = [move.uci() for move in board.legal_moves]
-        legal_moves_str = ', '.join(legal_moves)
+        move_index = self.move_index_for(board, move_index)
+        moves_line = self.moves_prompt_line(move_index, mode)
+        board_str = move_index.board_str
 
         for attempt in range(max_retries):
-            board_matrix = self.get_board_matrix(board)
-            board_str = '\n'.join([' '.join(row) for row in board_matrix])
-
             if previous_invalid_move:
                 feedback = (
                     f"The move '{previous_invalid_move}' you provided was invalid or illegal in the current position. "
-                    f"Please analyze the board state carefully, think about why your move was invalid, and provide a valid move from the available legal moves."
+                    f"Please analyze the board state carefully, think about why your move was invalid, and provide a valid move from the listed moves."
                 )
             else:
                 feedback = ""
@@ -54,7 +213,7 @@ class AIModule:
                     f"{board_str}\n\n"
                     f"The chessboard is represented by a matrix where 'wP' represents a white pawn, 'bK' represents a black king, and so on. "
                     f"Empty squares are shown as '__'. Analyze the board and suggest the best possible move for {'Black' if color == chess.BLACK else 'White'}.\n\n"
-                    f"**Available Legal Moves:** {legal_moves_str}\n\n"  
+                    f"{moves_line}\n\n"
                     f"**Rules for Chess:**\n"
                     f"1. **Pawn Movements:**\n"
                     f"   - Pawns move forward one square. From their initial position, they can move two squares forward.\n"
@@ -79,7 +238,7 @@ class AIModule:
                     f"{board_str}\n\n"
                     f"The chessboard is represented by a matrix where 'wP' represents a white pawn, 'bK' represents a black king, and so on. "
                     f"Empty squares are shown as '__'. Analyze the board and suggest the best possible move for {'Black' if color == chess.BLACK else 'White'}.\n\n"
-                    f"**Available Legal Moves:** {legal_moves_str}\n\n"  # Added legal moves
+                    f"{moves_line}\n\n"
                     f"**Rules for Chess:**\n"
                     f"1. **Pawn Movements:**\n"
                     f"   - Pawns move forward one square. From their initial position, they can move two squares forward.\n"
@@ -100,14 +259,18 @@ class AIModule:
 
             logging.info(f"AI Prompt (Mode: {mode}, Attempt: {attempt + 1}): {prompt}")
 
+            model = self.choose_model(board, mode, time_left, exclude=failed_models)
+            started = time.perf_counter()
             try:
-                response = self.llm.invoke([("system", prompt)])
-                response_content = response.content.strip()
+                self.stats['requests'] += 1
+                with exchange(self.session_id, request_id, attempt + 1, **position):
+                    response_content = self.complete(model, prompt, on_text, mode).strip()
                 logging.info(f"AI Response (Mode: {mode}, Attempt: {attempt + 1}): {response_content}")
 
                 if mode == 'Chess Teaching':
                    
-                    move, explanation = self.parse_teaching_response(response_content, board)
+                    move, explanation = self.parse_teaching_response(response_content, board, move_index)
+                    self.record_outcome(model, started, legal=move is not None)
                     if move:
                         return move, explanation
                     else:
@@ -116,10 +279,12 @@ class AIModule:
                             previous_invalid_move = move_match.group(1).strip()
                         else:
                             previous_invalid_move = "unknown"
+                        self.stats['invalid_moves'] += 1
                         logging.warning(f"AI provided an invalid move on attempt {attempt + 1}. Response: {response_content}")
                         self.st.warning(f"AI provided an invalid move on attempt {attempt + 1}. Sending feedback to AI...")
                 else:
-                    move = self.parse_playing_response(response_content, board)
+                    move = self.parse_playing_response(response_content, board, move_index)
+                    self.record_outcome(model, started, legal=move is not None)
                     if move:
                         return move, None
                     else:
@@ -128,17 +293,43 @@ class AIModule:
                             previous_invalid_move = move_match.group(1).strip()
                         else:
                             previous_invalid_move = "unknown"
+                        self.stats['invalid_moves'] += 1
                         logging.warning(f"AI provided an invalid move on attempt {attempt + 1}. Response: {response_content}")
                         self.st.warning(f"AI provided an invalid move on attempt {attempt + 1}. Sending feedback to AI...")
 
             except Exception as e:
-                logging.error(f"Error obtaining AI move on attempt {attempt + 1}: {e}")
+                self.stats['errors'] += 1
+                # Fail over: the next attempt goes to another model if the router has one
+                self.record_outcome(model, started, error=True)
+                failed_models.add(model)
+                logging.error(f"Error obtaining AI move on attempt {attempt + 1} ({model}): {e}")
                 self.st.warning(f"Error obtaining AI move on attempt {attempt + 1}. Retrying...")
 
-        self.st.warning("AI failed to provide a valid move after multiple attempts. Choosing a random legal move instead.")
-        return self.select_random_move(board), None
+        self.stats['fallbacks'] += 1
+        self.st.warning("AI failed to provide a valid move after multiple attempts. Playing the engine's top candidate instead.")
+        return self.select_fallback_move(board, move_index), None
+
+    def get_endgame_move(self, board, mode):
+        """The endgame-table move for this position as (move, explanation), or None if no table covers it yet."""
+        if self.endgame is None:
+            return None
+        solved = self.endgame.best_move(board)
+        if solved is None:
+            return None
+        move, (result, plies) = solved
+        self.stats['endgame_moves'] += 1
+        logging.info(f"Endgame table move: {move.uci()} ({result} in {plies} plies)")
+        if mode != 'Chess Teaching':
+            return move, None
+        if result == 'win':
+            explanation = f"Endgame tables show a forced mate in {(plies + 1) // 2}; this move is the fastest way there."
+        elif result == 'draw':
+            explanation = "With best play this ending is a draw; this move keeps it that way."
+        else:
+            explanation = f"This ending is lost against best play; this move holds out longest (mate in {plies // 2})."
+        return move, explanation
 
-    def parse_teaching_response(self, response_content, board):
+    def parse_teaching_response(self, response_content, board, move_index=None):
         """
         Parse the AI response in Chess Teaching mode using regular expressions.
         Expected format:
@@ -154,14 +345,13 @@ class AIModule:
         if move_match and explanation_match:
             move_str = move_match.group(1)
             explanation = explanation_match.group(1).strip()
-            move = self.parse_move(move_str, board)
+            move = self.parse_move(move_str, board, move_index)
             if move:
-                if move in board.legal_moves:
-                    return move, explanation
+                return move, explanation
         logging.warning(f"Failed to parse teaching response. Content received: {response_content}")
         return None, None
 
-    def parse_playing_response(self, response_content, board):
+    def parse_playing_response(self, response_content, board, move_index=None):
         """
         Parse the AI response in Chess Playing mode.
         Expected format:
@@ -170,26 +360,28 @@ class AIModule:
         move_pattern = r"Move:\s*([a-h][1-8][a-h][1-8])"
 
         move_match = re.search(move_pattern, response_content, re.IGNORECASE)
+        move_index = self.move_index_for(board, move_index)
 
         if move_match:
             move_str = move_match.group(1)
-            move = self.parse_move(move_str, board)
-            if move and move in board.legal_moves:
+            move = self.parse_move(move_str, board, move_index)
+            if move:
                 return move
         else:
             potential_moves = re.findall(r'\b([a-h][1-8][a-h][1-8])\b', response_content)
             for pm in potential_moves:
-                move = self.parse_move(pm, board)
-                if move and move in board.legal_moves:
+                move = self.parse_move(pm, board, move_index)
+                if move:
                     return move
         logging.warning(f"Failed to parse playing response. Content received: {response_content}")
         return None
 
-    def select_random_move(self, board):
-        """Select a random legal move from the current board."""
-        move = random.choice(list(board.legal_moves))
-        self.st.warning(f"Random Move Chosen: {move.uci()}")
-        logging.info(f"Random Move Chosen: {move.uci()}")
+    def select_fallback_move(self, board, move_index=None):
+        """Select the local ranker's best move, used when the LLM fails to produce a legal one."""
+        ranked = rank_moves(self.move_index_for(board, move_index), self.ranker_depth)
+        move = ranked[0][0]
+        self.st.warning(f"Engine Move Chosen: {move.uci()}")
+        logging.info(f"Engine Move Chosen: {move.uci()}")
         return move
 
     def get_board_matrix(self, board):
@@ -197,54 +389,41 @@ class AIModule:
         Returns the board as a list of strings representing each row.
         Each piece is represented by 'wP', 'bK', etc., and empty squares as '__'.
         """
-        board_matrix = []
-        for rank in range(7, -1, -1):  
-            row = []
-            for file in range(8): 
-                square = chess.square(file, rank)
-                piece = board.piece_at(square)
-                if piece is None:
-                    row.append('__')
-                else:
-                    color = 'w' if piece.color == chess.WHITE else 'b'
-                    piece_symbol = piece.symbol().upper()
-                    row.append(f"{color}{piece_symbol}")
-            board_matrix.append(row)
-        return board_matrix
-
-    def parse_move(self, move_str, board):
-        """Attempt to parse a move from a string, trying UCI and then SAN."""
-        move = None
-        try:
-            move = chess.Move.from_uci(move_str)
-            if move in board.legal_moves:
-                return move
-        except ValueError:
-            pass
-        try:
-            move = board.parse_san(move_str)
-            if move in board.legal_moves:
-                return move
-        except ValueError:
-            pass
+        return board_matrix(board)
+
+    def parse_move(self, move_str, board, move_index=None):
+        """Attempt to parse a move from a string, trying UCI and then SAN (including loose SAN spellings)."""
+        return self.move_index_for(board, move_index).lookup(move_str)
+
+    def validate_suggestion(self, suggestion, board, move_index):
+        """The suggestion with its move normalized to UCI, or None (with a warning) if it is unusable."""
+        if not isinstance(suggestion, dict):
+            return None
+        move_str = str(suggestion.get('move', '')).strip()
+        explanation = str(suggestion.get('explanation', '')).strip()
+        move = self.parse_move(move_str, board, move_index)
+        if move and explanation:
+            return dict(suggestion, move=move.uci(), explanation=explanation)
+        self.st.warning(f"AI suggested an invalid move or missing explanation: {move_str}. It will be skipped.")
+        logging.warning(f"Invalid suggestion: Move={move_str}, Explanation={explanation}")
         return None
 
-    def suggest_moves(self, board):
+    def suggest_moves(self, board, move_index=None, on_suggestion=None):
         """
         Get AI suggestions for the player's possible moves.
+        With `on_suggestion`, the response is streamed and each valid suggestion is passed to it
+        as soon as its JSON object is complete.
         """
-        board_matrix = self.get_board_matrix(board)
-        board_str = '\n'.join([' '.join(row) for row in board_matrix])
-
-        legal_moves = [move.uci() for move in board.legal_moves]
-        legal_moves_str = ', '.join(legal_moves)
+        move_index = self.move_index_for(board, move_index)
+        board_str = move_index.board_str
+        moves_line = self.moves_prompt_line(move_index, 'Suggestions')
 
         prompt = (
             f"You are a 2800-rated chess grandmaster. Below is the current state of the chessboard:\n\n"
             f"{board_str}\n\n"
             f"The chessboard is represented by a matrix where 'wP' represents a white pawn, 'bK' represents a black king, and so on. "
-            f"Empty squares are shown as '__'. Analyze the board and suggest three strong candidate moves for {'White' if board.turn == chess.WHITE else 'Black'}'s next turn from the available legal moves, along with brief explanations.\n\n"
-            f"**Available Legal Moves:** {legal_moves_str}\n\n"  
+            f"Empty squares are shown as '__'. Analyze the board and suggest three strong candidate moves for {'White' if board.turn == chess.WHITE else 'Black'}'s next turn from the listed moves, along with brief explanations.\n\n"
+            f"{moves_line}\n\n"
             f"**Rules for Chess:**\n"
             f"1. **Pawn Movements:**\n"
             f"   - Pawns move forward one square. From their initial position, they can move two squares forward.\n"
@@ -275,36 +454,47 @@ class AIModule:
 
         logging.info(f"AI Suggestions Prompt: {prompt}")
 
+        model = self.choose_model(board, 'Suggestions')
+        started = time.perf_counter()
+        parser = JsonArrayStream()
+        received = []
+        valid_suggestions = []
+
+        def on_text(text):
+            for suggestion in parser.update(text):
+                # Only the first three are asked for; anything after them is ignored
+                if len(received) == 3:
+                    break
+                received.append(suggestion)
+                suggestion = self.validate_suggestion(suggestion, board, move_index)
+                if suggestion:
+                    valid_suggestions.append(suggestion)
+                    if on_suggestion:
+                        on_suggestion(suggestion)
+
         try:
-            response = self.llm.invoke([("system", prompt)])
-            response_content = response.content.strip()
+            # Only streamed when someone is waiting on the suggestions one by one
+            with exchange(self.session_id, uuid.uuid4().hex[:8], 1, board.fen(), 'Suggestions',
+                          'white' if board.turn == chess.WHITE else 'black'):
+                response_content = self.complete(
+                    model, prompt, on_text if on_suggestion else None, 'Suggestions'
+                ).strip()
+            if on_suggestion is None:
+                on_text(response_content)
             logging.info(f"AI Suggestions Response: {response_content}")
 
-            suggestions = json.loads(response_content)
-            if isinstance(suggestions, list) and len(suggestions) == 3:
-                valid_suggestions = []
-                for suggestion in suggestions:
-                    move_str = suggestion.get('move', '').strip()
-                    explanation = suggestion.get('explanation', '').strip()
-                    move = self.parse_move(move_str, board)
-                    if move and explanation and move in board.legal_moves:
-                        suggestion['move'] = move.uci() 
-                        valid_suggestions.append(suggestion)
-                    else:
-                        self.st.warning(f"AI suggested an invalid move or missing explanation: {move_str}. It will be skipped.")
-                        logging.warning(f"Invalid suggestion: Move={move_str}, Explanation={explanation}")
-                if len(valid_suggestions) == 0:
-                    self.st.warning("No valid suggestions were provided by the AI.")
-                return valid_suggestions
-            else:
-                self.st.warning("AI did not return a valid suggestions list.")
-                logging.warning(f"Invalid suggestions format received: {response_content}")
+            # The result is exactly what the parser accepted, so it matches what was shown while streaming
+            if not received:
+                self.record_outcome(model, started, legal=False)
+                logging.error(f"No suggestions could be parsed from: {response_content}")
+                self.st.error("Failed to parse AI suggestions. Please try again.")
                 return []
-        except json.JSONDecodeError as e:
-            logging.error(f"Error parsing AI suggestions: {e}")
-            self.st.error("Failed to parse AI suggestions. Please try again.")
-            return []
+            self.record_outcome(model, started, legal=len(valid_suggestions) == len(received) == 3)
+            if len(valid_suggestions) == 0:
+                self.st.warning("No valid suggestions were provided by the AI.")
+            return valid_suggestions
         except Exception as e:
+            self.record_outcome(model, started, error=True)
             logging.error(f"Error obtaining AI suggestions: {e}")
             self.st.error("An error occurred while obtaining AI suggestions.")
             return []
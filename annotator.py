@@ -0,0 +1,268 @@
+"""
+Whole-game analysis.
+
+Runs every ply of a game through the local ranker and the endgame tables on a bounded
+thread pool, optionally asking the AI coach to explain the mistakes it finds, and turns
+the results into PGN comments and NAGs. Position analyses are cached across games, and
+each game's progress is appended to a job file so an interrupted run picks up where it
+stopped.
+
+    python annotator.py games.pgn --output annotated.pgn --workers 8
+    python annotator.py games.pgn --output annotated.pgn --explain llm --model llama-3.3-70b-versatile
+"""
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import chess
+import chess.pgn
+
+from endgame import shared_tables
+from move_index import MoveIndex
+from ranker import format_score, rank_moves
+
+ANNOTATION_JOBS_DIR = os.environ.get(
+    'ANNOTATION_JOBS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'annotations')
+)
+
+# Centipawns lost against the best move, from the largest, and the NAG each earns
+MISTAKE_NAGS = [
+    (300, chess.pgn.NAG_BLUNDER),
+    (150, chess.pgn.NAG_MISTAKE),
+    (70, chess.pgn.NAG_DUBIOUS_MOVE),
+]
+# A best move this much better than the runner-up is marked as the only good move
+ONLY_MOVE_MARGIN = 200
+# Mate scores are capped so a missed mate counts as a blunder without dwarfing everything else
+SCORE_CAP = 2000
+
+
+@functools.lru_cache(maxsize=50000)
+def analyze_position(epd, depth):
+    """Ranked (uci, centipawns) pairs for a position. Cached, since openings repeat across games."""
+    board, _ = chess.Board.from_epd(epd)
+    return tuple((move.uci(), score) for move, score in rank_moves(MoveIndex(board), depth))
+
+
+def capped(score):
+    return max(-SCORE_CAP, min(SCORE_CAP, score))
+
+
+def table_verdict(board, move):
+    """
+    (nag, comment) from the endgame tables when they cover the position, or None.
+    Only moves that change the theoretical result are marked.
+    """
+    tables = shared_tables()
+    solved = tables.best_move(board)
+    if solved is None:
+        return None
+    best, (result, plies) = solved
+    board.push(move)
+    outcome = tables.probe(board)
+    board.pop()
+    if outcome is None:
+        return None
+    played = {'win': 'loss', 'loss': 'win', 'draw': 'draw'}[outcome[0]]
+    if played == result:
+        return None, ""
+    best_san = board.san(best)
+    if result == 'win':
+        return chess.pgn.NAG_BLUNDER, f"Throws away the win. {best_san} mates in {(plies + 1) // 2}."
+    return chess.pgn.NAG_BLUNDER, f"Loses a drawn ending. {best_san} holds the draw."
+
+
+def annotate_ply(board, move, depth=1, coach=None):
+    """
+    Analyze one move played from `board`. Returns a JSON-serializable dict with the played
+    and best moves, their scores, the NAG (or None) and a comment.
+    """
+    ranked = analyze_position(board.epd(), depth)
+    scores = dict(ranked)
+    best_uci, best_score = ranked[0]
+    score = scores[move.uci()]
+    loss = capped(best_score) - capped(score)
+
+    nag = next((nag for threshold, nag in MISTAKE_NAGS if loss >= threshold), None)
+    comment = ""
+    verdict = table_verdict(board, move)
+    if verdict is not None:
+        nag, comment = verdict
+    elif nag is not None:
+        best_san = board.san(chess.Move.from_uci(best_uci))
+        comment = f"{format_score(score)}. Better was {best_san} ({format_score(best_score)})."
+    elif move.uci() == best_uci and len(ranked) > 1 and best_score - ranked[1][1] >= ONLY_MOVE_MARGIN:
+        nag = chess.pgn.NAG_GOOD_MOVE
+        comment = f"The only good move ({format_score(score)})."
+
+    if coach is not None and nag in (chess.pgn.NAG_BLUNDER, chess.pgn.NAG_MISTAKE):
+        coach_move, explanation = coach.get_ai_move(board, board.turn, 'Chess Teaching')
+        if coach_move is not None and explanation:
+            comment = f"{comment} Coach suggests {board.san(coach_move)}: {explanation}".strip()
+
+    return {
+        'move': move.uci(),
+        'san': board.san(move),
+        'score': score,
+        'best': best_uci,
+        'best_score': best_score,
+        'nag': nag,
+        'comment': comment,
+    }
+
+
+def job_key(moves, depth, explain, starting_fen=chess.STARTING_FEN):
+    digest = hashlib.sha1(f"{starting_fen}|{' '.join(moves)}|{depth}|{explain}".encode()).hexdigest()
+    return digest[:16]
+
+
+def load_job(path, key):
+    """Annotations already finished for this job, keyed by ply. A job file for another game is ignored."""
+    completed = {}
+    if not path or not os.path.exists(path):
+        return completed
+    with open(path) as f:
+        lines = f.read().splitlines()
+    if not lines or json.loads(lines[0]).get('key') != key:
+        return completed
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # a line cut short by the interruption
+        completed[entry['ply']] = entry
+    return completed
+
+
+def annotate_game(moves, depth=1, coach=None, workers=4, job_path=None, progress=None,
+                  starting_fen=chess.STARTING_FEN):
+    """
+    Annotate every ply of a game given as UCI strings. Returns one annotation dict per ply.
+    `progress(done, total)` is called from the calling thread as plies finish, and finished
+    plies are appended to `job_path` so a rerun after an interruption only does the rest.
+    """
+    key = job_key(moves, depth, coach is not None, starting_fen)
+    completed = load_job(job_path, key)
+
+    board = chess.Board(starting_fen)
+    positions = []
+    for uci in moves:
+        move = chess.Move.from_uci(uci)
+        positions.append((board.copy(stack=False), move))
+        board.push(move)
+    total = len(positions)
+    pending = [ply for ply in range(total) if ply not in completed]
+    if progress:
+        progress(total - len(pending), total)
+
+    job_file = None
+    if job_path:
+        os.makedirs(os.path.dirname(job_path) or '.', exist_ok=True)
+        # Rewritten rather than appended to, so a line cut short by an interruption is dropped
+        job_file = open(job_path, 'w')
+        job_file.write(json.dumps({'key': key, 'plies': total}) + "\n")
+        for ply in sorted(completed):
+            job_file.write(json.dumps(completed[ply]) + "\n")
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(annotate_ply, *positions[ply], depth, coach): ply for ply in pending}
+        for future in as_completed(futures):
+            ply = futures[future]
+            completed[ply] = dict(future.result(), ply=ply)
+            if job_file:
+                job_file.write(json.dumps(completed[ply]) + "\n")
+                job_file.flush()
+            if progress:
+                progress(len(completed), total)
+    finally:
+        # If the caller is interrupted (e.g. a Streamlit rerun), drop the queued plies instead of waiting
+        pool.shutdown(wait=False, cancel_futures=True)
+        if job_file:
+            job_file.close()
+    logging.info(f"Annotated {total} plies ({total - len(pending)} resumed from {job_path})")
+    return [completed[ply] for ply in range(total)]
+
+
+def annotate_pgn_game(game, annotations):
+    """Write annotations onto the mainline of a chess.pgn.Game as comments and NAGs."""
+    for node, annotation in zip(game.mainline(), annotations):
+        if annotation['comment']:
+            node.comment = annotation['comment']
+        if annotation['nag']:
+            node.nags.add(annotation['nag'])
+    return game
+
+
+def summary(annotations):
+    counts = {'??': 0, '?': 0, '?!': 0, '!': 0}
+    symbols = {chess.pgn.NAG_BLUNDER: '??', chess.pgn.NAG_MISTAKE: '?', chess.pgn.NAG_DUBIOUS_MOVE: '?!',
+               chess.pgn.NAG_GOOD_MOVE: '!'}
+    for annotation in annotations:
+        if annotation['nag'] in symbols:
+            counts[symbols[annotation['nag']]] += 1
+    return counts
+
+
+def make_coach(args):
+    if args.explain == 'none':
+        return None
+    from ai_module import AIModule
+    from headless import HeadlessStreamlit
+    st = HeadlessStreamlit(keep_messages=False)
+    if args.explain == 'fake':
+        from fake_llm import FakeLLM
+        return AIModule(st, llm=FakeLLM(seed=args.seed))
+    return AIModule(st, model=args.model, base_url=args.base_url)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Annotate every move of the games in a PGN file.")
+    parser.add_argument('pgn', help="PGN file with the games to annotate.")
+    parser.add_argument('--output', required=True, help="Annotated PGN file to write.")
+    parser.add_argument('--workers', type=int, default=4, help="Plies analyzed concurrently.")
+    parser.add_argument('--depth', type=int, default=1, help="Ranker search depth in plies.")
+    parser.add_argument('--explain', choices=('none', 'fake', 'llm'), default='none',
+                        help="Ask an AI coach to explain mistakes and blunders.")
+    parser.add_argument('--model', default="llama-3.1-8b-instant", help="Groq model for --explain llm.")
+    parser.add_argument('--base-url', default=os.environ.get('GROQ_API_BASE'), help="Groq API base URL.")
+    parser.add_argument('--jobs-dir', default=ANNOTATION_JOBS_DIR, help="Where resumable job files are kept.")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    coach = make_coach(args)
+    with open(args.pgn) as pgn_file, open(args.output, 'w') as output:
+        number = 0
+        while True:
+            game = chess.pgn.read_game(pgn_file)
+            if game is None:
+                break
+            number += 1
+            moves = [move.uci() for move in game.mainline_moves()]
+            fen = game.board().fen()
+            key = job_key(moves, args.depth, coach is not None, fen)
+            job_path = os.path.join(args.jobs_dir, f"{key}.jsonl")
+
+            def progress(done, total):
+                print(f"\rgame {number}: {done}/{total} plies", end='', flush=True)
+
+            annotations = annotate_game(moves, args.depth, coach, args.workers, job_path, progress, fen)
+            annotate_pgn_game(game, annotations)
+            output.write(str(game) + "\n\n")
+            output.flush()
+            counts = summary(annotations)
+            print(f"  {', '.join(f'{symbol} {count}' for symbol, count in counts.items())}")
+            os.remove(job_path)
+    print(f"{number} games written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,13 @@
 import streamlit as st
-import chess
-import chess.svg
-import chess.pgn
-import base64
 import os
-import requests
-import time
 import logging
 from chess_game import ChessGame
 from ai_module import AIModule
 from game_ui import GameUI
+from spectator_ui import SpectatorUI
+from simul_ui import SimulUI
+from model_router import ModelRouter, chat_models
+import groq_session
 
 class Config:
     PAGE_TITLE = "♟️ Chess Game"
@@ -19,25 +17,25 @@ class Config:
         'About': "## Chess Game with AI\nDeveloped by [Groqlabs](https://wow.groq.com/groq-labs/)"
     }
     LOG_FILE = 'ai_responses.log'
+    # Point at a local stand-in (see groq_stub_server.py) to run without the real provider
+    GROQ_API_BASE = os.environ.get('GROQ_API_BASE', 'https://api.groq.com').rstrip('/')
+    AUTO_MODEL = "Auto (route by measured latency and accuracy)"
 
 def fetch_groq_models(api_key):
-    url = "https://api.groq.com/openai/v1/models"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    """Active model ids for the key, cached per key for a few minutes (see groq_session.py)."""
+    import requests
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        models = [model['id'] for model in data.get('data', []) if model.get('active', False)]
-        return models
+        return groq_session.fetch_models(api_key, Config.GROQ_API_BASE)
+    except groq_session.InvalidApiKey as err:
+        st.error(f"{err} Please reset and enter a valid Groq API Key.")
     except requests.exceptions.RequestException as err:
         st.error(f"An error occurred: {err}")
     return None
 
 def reset_app():
-    keys_to_reset = ['game', 'ai_module', 'ui', 'logging_initialized']
+    if 'simul' in st.session_state:
+        st.session_state.simul.scheduler.shutdown()
+    keys_to_reset = ['game', 'ai_module', 'ui', 'simul', 'simul_ui', 'logging_initialized']
     for key in keys_to_reset:
         if key in st.session_state:
             del st.session_state[key]
@@ -51,6 +49,14 @@ def main():
         menu_items=Config.MENU_ITEMS
     )
 
+    # Spectators of a broadcast need no API key: everything they see is computed once for all viewers
+    watch = st.query_params.get('watch')
+    if watch:
+        if 'spectator_ui' not in st.session_state:
+            st.session_state.spectator_ui = SpectatorUI(st)
+        st.session_state.spectator_ui.render(watch)
+        st.stop()
+
     # Inject JavaScript to load API key from localStorage
     load_key_js = """
     <script>
@@ -69,6 +75,7 @@ def main():
 
     if not st.session_state.api_key_set:
         st.title("Welcome to the ♟️ Chess Game with AI")
+        SpectatorUI(st).render_live_list()
 
         with st.form(key='api_key_form'):
             api_key = st.text_input("Enter your Groq API Key", type='password')
@@ -76,6 +83,16 @@ def main():
 
         if submit_button:
             if api_key.strip():
+                # Also fetches and caches the model catalog for the next screen
+                with st.spinner("Checking API key..."):
+                    try:
+                        groq_session.validate_key(api_key.strip(), Config.GROQ_API_BASE)
+                    except groq_session.InvalidApiKey:
+                        st.error("This Groq API Key was rejected. Please check it and try again.")
+                        st.stop()
+                    except Exception as err:
+                        # Not the key's fault; the model selection screen reports it if it persists
+                        logging.warning(f"Could not validate API key: {err}")
                 # Store API key in localStorage using JavaScript
                 store_key_js = f"""
                 <script>
@@ -104,11 +121,12 @@ def main():
 
         if models is not None and len(models) > 0:
             with st.form(key='model_selection_form'):
-                selected_model = st.selectbox("Choose a model", options=models)
+                selected_model = st.selectbox("Choose a model", options=[Config.AUTO_MODEL] + models)
                 submit_model_button = st.form_submit_button(label='Select Model')
 
             if submit_model_button:
                 st.session_state.selected_model = selected_model
+                st.session_state.available_models = models
                 st.session_state.model_selected = True
                 st.success(f"Model '{selected_model}' selected successfully! Starting the game...")
                 st.rerun()
@@ -132,14 +150,30 @@ def main():
     if 'game' not in st.session_state:
         st.session_state.game = ChessGame(st)
     if 'ai_module' not in st.session_state:
-        st.session_state.ai_module = AIModule(st, model=selected_model)
+        if selected_model == Config.AUTO_MODEL:
+            router = ModelRouter(chat_models(st.session_state.available_models) or st.session_state.available_models)
+            st.session_state.ai_module = AIModule(
+                st, model=router.models[0], base_url=Config.GROQ_API_BASE, router=router,
+                api_key=st.session_state.api_key
+            )
+        else:
+            st.session_state.ai_module = AIModule(
+                st, model=selected_model, base_url=Config.GROQ_API_BASE, api_key=st.session_state.api_key
+            )
+        # Warm the connection to the first model while the player fills in the setup form
+        st.session_state.ai_module.prewarm()
     if 'ui' not in st.session_state:
         st.session_state.ui = GameUI(st.session_state.game, st.session_state.ai_module, st)
 
     game = st.session_state.game
     ui = st.session_state.ui
 
-    if not game.game_started:
+    if 'simul' in st.session_state:
+        if 'simul_ui' not in st.session_state:
+            st.session_state.simul_ui = SimulUI(st.session_state.simul, st.session_state.ai_module, st)
+        st.session_state.simul_ui.render()
+        st.button("Reset Game Setup", on_click=reset_app)
+    elif not game.game_started:
         ui.initial_setup()
     else:
         if not game.game_over:
@@ -149,6 +183,8 @@ def main():
             st.write("### 🏁 Game Over")
             st.write(f"**Result:** {game.result}")
             logging.info(f"Game Over: {game.result}")
+            ui.render_eval_graph(game.get_eval_series())
+            ui.render_analysis()
             if st.button("Restart Game"):
                 ui.reset_game()
                 st.rerun()
@@ -0,0 +1,300 @@
+"""
+Offline benchmark suite.
+
+Runs the AI, parsing and rendering hot paths against the fixed corpus in `data/`
+with FakeLLM standing in for ChatGroq, so no network access or API key is needed.
+Also profiles `import app` and exits non-zero if the LLM stack is imported eagerly.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import chess
+import chess.pgn
+
+from ai_module import AIModule
+from board_component import BoardComponent
+from chess_game import ChessGame
+from endgame import shared_tables
+from evaluator import evaluate_batch
+from fake_llm import FakeLLM
+from game_ui import GameUI
+from headless import HeadlessStreamlit
+from move_index import MoveIndex
+from ranker import rank_moves
+
+DEFAULT_POSITIONS = 'data/bench_positions.epd'
+DEFAULT_GAMES = 'data/bench_games.pgn'
+# Modules that must not be loaded until a model has been chosen
+LAZY_MODULES = ('langchain_groq', 'langchain_core', 'groq')
+
+
+def load_positions(path):
+    boards = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                board, _ = chess.Board.from_epd(line)
+                boards.append(board)
+    return boards
+
+
+def load_games(path):
+    games = []
+    with open(path) as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            games.append(game)
+    return games
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(name, func, cases, iterations):
+    """
+    Time `func(case)` for every case, `iterations` times over, then repeat one pass under
+    tracemalloc to count allocations. Timing and allocation passes are kept separate
+    because tracemalloc slows down every allocation it records.
+    """
+    func(cases[0])  # warm-up
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for case in cases:
+            t0 = time.perf_counter()
+            func(case)
+            latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    snapshot_before = tracemalloc.take_snapshot()
+    for case in cases:
+        func(case)
+    snapshot_after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = snapshot_after.compare_to(snapshot_before, 'filename')
+    allocated_blocks = sum(max(stat.count_diff, 0) for stat in stats)
+
+    latencies.sort()
+    calls = len(latencies)
+    return {
+        'name': name,
+        'calls': calls,
+        'throughput_per_s': calls / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': latencies[-1] * 1000,
+        'peak_alloc_kb_per_pass': (peak - before) / 1024,
+        'retained_blocks_per_pass': allocated_blocks,
+    }
+
+
+def build_benchmarks(args):
+    st = HeadlessStreamlit(keep_messages=False)
+    llm = FakeLLM(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        illegal_rate=args.illegal_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    ai_module = AIModule(st, llm=llm)
+    game = ChessGame(st)
+    ui = GameUI(game, ai_module, st)
+
+    boards = [b for b in load_positions(args.positions) if not b.is_game_over()]
+    games = load_games(args.games)
+    histories = [[move.uci() for move in g.mainline_moves()] for g in games]
+    game_positions = []
+    for g in games:
+        board = g.board()
+        positions_in_game = [board.copy(stack=False)]
+        for move in g.mainline_moves():
+            board.push(move)
+            positions_in_game.append(board.copy(stack=False))
+        game_positions.append(positions_in_game)
+
+    # The app builds one MoveIndex per ply and shares it, so the per-call benchmarks reuse one per position
+    indexes = [MoveIndex(b) for b in boards]
+    positions = list(zip(boards, indexes))
+    uci_cases = [(b, i, next(iter(b.legal_moves)).uci()) for b, i in positions]
+    san_cases = [(b, i, b.san(next(iter(b.legal_moves)))) for b, i in positions]
+    invalid_cases = [(b, i, 'z9z9') for b, i in positions]
+    playing_cases = [(b, i, f"Move: {next(iter(b.legal_moves)).uci()}") for b, i in positions]
+    teaching_cases = [(b, i, f"Move: {next(iter(b.legal_moves)).uci()}\nExplanation: Develops a piece.")
+                      for b, i in positions]
+
+    # Build the endgame tables up front (once per cache directory) so their first use is not timed
+    tables = shared_tables()
+    tables.build()
+    endgame_boards = [b for b in boards if tables.signature(b)[0]]
+
+    def run_board_updates(positions_in_game):
+        # One board following a whole game, as the main board does across reruns
+        board_ui = BoardComponent(st, 'bench')
+        return [board_ui.build_args(b, interactive=True) for b in positions_in_game]
+
+    def run_history(moves):
+        game.move_history = moves
+        return ui.generate_move_history_table()
+
+    return [
+        ('MoveIndex', MoveIndex, boards),
+        # A fresh index each call, since rankings are cached on the index
+        ('rank_moves', lambda b: rank_moves(MoveIndex(b)), boards),
+        ('get_ai_move[playing]', lambda c: ai_module.get_ai_move(c[0], c[0].turn, 'Chess Playing', move_index=c[1]),
+         positions),
+        ('get_ai_move[teaching]', lambda c: ai_module.get_ai_move(c[0], c[0].turn, 'Chess Teaching', move_index=c[1]),
+         positions),
+        ('suggest_moves', lambda c: ai_module.suggest_moves(c[0], c[1]), positions),
+        ('endgame_best_move', tables.best_move, endgame_boards),
+        ('parse_move[uci]', lambda c: ai_module.parse_move(c[2], c[0], c[1]), uci_cases),
+        ('parse_move[san]', lambda c: ai_module.parse_move(c[2], c[0], c[1]), san_cases),
+        ('parse_move[invalid]', lambda c: ai_module.parse_move(c[2], c[0], c[1]), invalid_cases),
+        ('parse_playing_response', lambda c: ai_module.parse_playing_response(c[2], c[0], c[1]), playing_cases),
+        ('parse_teaching_response', lambda c: ai_module.parse_teaching_response(c[2], c[0], c[1]), teaching_cases),
+        ('evaluate_batch[game]', evaluate_batch, game_positions),
+        ('board_component[game]', run_board_updates, game_positions),
+        ('generate_move_history_table', run_history, histories),
+    ]
+
+
+def profile_imports(module='app', top=10):
+    """
+    Import `module` in a fresh interpreter under `-X importtime` and summarize the cold-start cost.
+    Also reports which of LAZY_MODULES were pulled in eagerly.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    total = next((cumulative for name, _, cumulative in imports if name == module), 0)
+    eager = sorted({name.split('.')[0] for name, _, _ in imports if name.split('.')[0] in LAZY_MODULES})
+    return {
+        'module': module,
+        'ok': completed.returncode == 0,
+        'total_ms': total / 1000,
+        'modules_imported': len(imports),
+        'eager_lazy_modules': eager,
+        'slowest_self_ms': [
+            {'module': name, 'self_ms': self_us / 1000}
+            for name, self_us, _ in sorted(imports, key=lambda i: i[1], reverse=True)[:top]
+        ],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, import_profile, baseline_path):
+    with open(baseline_path) as f:
+        report = json.load(f)
+    baseline = {r['name']: r for r in report['results']}
+    print(f"\nComparison against {baseline_path}:")
+    old_profile = report.get('import_profile')
+    if import_profile and old_profile and old_profile['total_ms']:
+        change = (import_profile['total_ms'] - old_profile['total_ms']) / old_profile['total_ms'] * 100
+        print(f"  {'import app':<30} {old_profile['total_ms']:9.1f} -> {import_profile['total_ms']:9.1f} ms "
+              f"({change:+6.1f}%)")
+    for result in results:
+        old = baseline.get(result['name'])
+        if not old or not old['p50_ms']:
+            continue
+        change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+        print(f"  {result['name']:<30} p50 {old['p50_ms']:9.3f} -> {result['p50_ms']:9.3f} ms ({change:+6.1f}%)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the chess AI and UI hot paths.")
+    parser.add_argument('--positions', default=DEFAULT_POSITIONS, help="EPD file with benchmark positions.")
+    parser.add_argument('--games', default=DEFAULT_GAMES, help="PGN file with benchmark games.")
+    parser.add_argument('--iterations', type=int, default=5, help="Passes over the corpus per benchmark.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake LLM latency in seconds.")
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help="Uniform +/- jitter on the latency.")
+    parser.add_argument('--illegal-rate', type=float, default=0.0, help="Fraction of fake LLM answers with an illegal move.")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Fraction of fake LLM answers that are malformed.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the fake LLM.")
+    parser.add_argument('--filter', default='', help="Only run benchmarks whose name contains this string.")
+    parser.add_argument('--skip-import-profile', action='store_true', help="Do not profile `import app`.")
+    parser.add_argument('--output', help="Write results as JSON to this path.")
+    parser.add_argument('--compare', help="Baseline JSON results to compare against.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.disable(logging.CRITICAL)
+
+    results = []
+    for name, func, cases in build_benchmarks(args):
+        if args.filter and args.filter not in name:
+            continue
+        result = measure(name, func, cases, args.iterations)
+        results.append(result)
+        print(f"{name:<30} {result['throughput_per_s']:>10.1f} ops/s  "
+              f"p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms  "
+              f"peak {result['peak_alloc_kb_per_pass']:8.1f} KiB")
+
+    import_profile = None
+    if not args.skip_import_profile:
+        import_profile = profile_imports()
+        print(f"{'import app':<30} {import_profile['total_ms']:10.1f} ms  "
+              f"{import_profile['modules_imported']} modules")
+        if import_profile['eager_lazy_modules']:
+            print(f"  imported eagerly: {', '.join(import_profile['eager_lazy_modules'])}")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'import_profile': import_profile,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, import_profile, args.compare)
+    if import_profile and (not import_profile['ok'] or import_profile['eager_lazy_modules']):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
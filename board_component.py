@@ -0,0 +1,97 @@
+"""
+Chess board as a Streamlit component that keeps its own state in the browser.
+
+Instead of re-sending a full SVG image on every rerun, each render sends only the squares
+that changed since the last version the board acknowledged (a move is 2-4 squares), plus
+the last move, the checked king and, when it is a human's turn, the legal moves for
+click-to-move. Each update carries the version it applies on top of; a board that does not
+have that version (a fresh iframe after a reload, a dropped update) asks for a full snapshot.
+"""
+import logging
+import os
+
+import chess
+
+COMPONENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'components', 'board')
+
+_component = None
+
+
+def board_component():
+    """The declared component, created on first use so importing this module stays cheap."""
+    global _component
+    if _component is None:
+        import streamlit.components.v1 as components
+        _component = components.declare_component('chess_board', path=COMPONENT_PATH)
+    return _component
+
+
+def placement(board):
+    """{square name: piece symbol} for every occupied square."""
+    return {chess.square_name(square): piece.symbol() for square, piece in board.piece_map().items()}
+
+
+def diff(old, new):
+    """Squares whose contents differ, mapped to the new symbol or None when the square emptied."""
+    changes = {square: symbol for square, symbol in new.items() if old.get(square) != symbol}
+    changes.update({square: None for square in old if square not in new})
+    return changes
+
+
+class BoardComponent:
+    """One board on the page. Keep the instance across reruns (e.g. on GameUI in session state)."""
+
+    def __init__(self, st, key):
+        self.st = st
+        self.key = key
+        self.version = 0
+        self.sent = {}
+        self.full = True
+        self.last_seq = None
+
+    def update(self, board):
+        """The (base_version, changes) to send for `board`, advancing the version when anything changed."""
+        current = placement(board)
+        if self.full:
+            self.full = False
+            base_version, changes = -1, current
+            self.version += 1
+        else:
+            base_version, changes = self.version, diff(self.sent, current)
+            if changes:
+                self.version += 1
+        self.sent = current
+        return base_version, changes
+
+    def build_args(self, board, interactive=False, size=400, orientation='white'):
+        base_version, changes = self.update(board)
+        last_move = board.move_stack[-1] if board.move_stack else None
+        king = board.king(board.turn) if board.is_check() else None
+        return {
+            'version': self.version,
+            'base_version': base_version,
+            'changes': changes,
+            'last_move': [chess.square_name(last_move.from_square), chess.square_name(last_move.to_square)]
+            if last_move else [],
+            'check': chess.square_name(king) if king is not None else None,
+            'legal': [move.uci() for move in board.legal_moves] if interactive else [],
+            'interactive': interactive,
+            'size': size,
+            'orientation': orientation,
+        }
+
+    def render(self, board, interactive=False, size=400, orientation='white'):
+        """Draw the board. Returns the UCI string of a move the user clicked since the last rerun, or None."""
+        args = self.build_args(board, interactive, size, orientation)
+        value = board_component()(**args, key=self.key, default=None)
+        # The last value sticks around on later reruns, so each event is handled once
+        if not value or value.get('seq') == self.last_seq:
+            return None
+        self.last_seq = value.get('seq')
+        if value.get('type') == 'resync':
+            logging.info(f"Board {self.key} at version {value.get('version')} asked for a full snapshot")
+            self.full = True
+            self.st.rerun()
+        if value.get('type') == 'move' and interactive:
+            return value.get('uci')
+        return None
@@ -0,0 +1,191 @@
+"""
+Broadcast games: one authoritative AI-vs-AI game per broadcast, watched by any number of sessions.
+
+A broadcast plays its moves on its own thread with a single AIModule, so the LLM is called
+once per move however many people are watching. After every move it publishes an immutable
+snapshot with everything a viewer draws (position, move history HTML, evaluation series,
+commentary), built once and shared by all viewers. Broadcasts live in this process; viewers
+must be served by the same Streamlit server.
+
+A broadcast nobody watches pauses after IDLE_GRACE seconds and is stopped after ABANDON_AFTER,
+so an abandoned game does not keep spending its host's API quota.
+"""
+import logging
+import threading
+import time
+import uuid
+
+from chess_game import ChessGame
+from headless import HeadlessStreamlit
+from utils import move_history_html
+
+# Minimum seconds between moves, so spectators can follow the game
+MOVE_INTERVAL = 2.0
+# A viewer that has not polled for this long is no longer counted
+VIEWER_TIMEOUT = 10.0
+# With no viewers for this long the game pauses until someone watches again
+IDLE_GRACE = 30.0
+# ... and with no viewers for this long it is stopped
+ABANDON_AFTER = 600.0
+# AI-vs-AI games can shuffle for a long time; the game is adjudicated a draw after this many plies
+MAX_PLIES = 400
+
+
+class Broadcast:
+    def __init__(self, broadcast_id, ai_module, mode='Chess Teaching', move_interval=MOVE_INTERVAL):
+        self.id = broadcast_id
+        self.ai_module = ai_module
+        self.mode = mode
+        self.move_interval = move_interval
+        self.game = ChessGame(HeadlessStreamlit(keep_messages=False))
+        self.game.player_white = self.game.player_black = 'AI'
+        self.game.player_white_type = self.game.player_black_type = 'AI'
+        self.game.game_started = True
+        self.status = 'live'
+        self.started_at = time.time()
+        self.finished_at = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.viewers_seen = {}
+        # Bumped on every publish, including the final one when the game ends or is stopped
+        self.published = 0
+        # Counts from the start, so the host has time to open the broadcast
+        self.last_viewed = time.monotonic()
+        self.snapshot = self.build_snapshot('')
+        self.thread = threading.Thread(target=self.run, name=f'broadcast-{broadcast_id}', daemon=True)
+
+    @property
+    def version(self):
+        return self.snapshot['version']
+
+    def build_snapshot(self, explanation):
+        """Everything a viewer renders for the current position. Never mutated once published."""
+        board = self.game.board
+        return {
+            'version': self.published,
+            'plies': len(self.game.move_history),
+            'board': board.copy(stack=1),
+            'history_html': move_history_html(self.game.move_history),
+            'eval_series': tuple(self.game.get_eval_series()),
+            'explanation': explanation,
+            'status': self.status,
+            'result': self.game.result,
+            'pgn': self.game.export_pgn() if self.status != 'live' else None,
+        }
+
+    def publish(self, explanation=''):
+        # Only the broadcast's own thread publishes
+        self.published += 1
+        snapshot = self.build_snapshot(explanation)
+        with self.lock:
+            self.snapshot = snapshot
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        board = self.game.board
+        try:
+            while not self.stopped.is_set():
+                if board.is_game_over(claim_draw=True) or len(self.game.move_history) >= MAX_PLIES:
+                    break
+                if not self.wait_for_viewers():
+                    break
+                started = time.monotonic()
+                move, explanation = self.ai_module.get_ai_move(
+                    board, board.turn, self.mode, move_index=self.game.get_move_index()
+                )
+                self.game.make_move(move)
+                self.publish(explanation or '')
+                self.stopped.wait(max(self.move_interval - (time.monotonic() - started), 0))
+            if self.stopped.is_set():
+                self.status = 'stopped'
+            else:
+                result = board.result(claim_draw=True)
+                self.game.result = {'1-0': "White wins!", '0-1': "Black wins!"}.get(result, "It's a draw!")
+                self.status = 'finished'
+        except Exception as e:
+            logging.error(f"Broadcast {self.id} failed: {e}")
+            self.status = 'error'
+        self.game.game_over = True
+        self.finished_at = time.time()
+        self.publish(self.snapshot['explanation'])
+        logging.info(f"Broadcast {self.id} {self.status} after {len(self.game.move_history)} plies")
+
+    def wait_for_viewers(self):
+        """Hold the game while nobody is watching. False once the broadcast is stopped or abandoned."""
+        paused = False
+        while not self.stopped.is_set():
+            idle = time.monotonic() - self.last_viewed
+            if idle < IDLE_GRACE:
+                if paused:
+                    logging.info(f"Broadcast {self.id} resumed")
+                return True
+            if idle >= ABANDON_AFTER:
+                logging.info(f"Broadcast {self.id} abandoned after {idle:.0f}s without viewers")
+                self.stop()
+                return False
+            if not paused:
+                logging.info(f"Broadcast {self.id} paused: no viewers for {idle:.0f}s")
+                paused = True
+            self.stopped.wait(1.0)
+        return False
+
+    def touch(self, viewer_id):
+        """Record that a viewer is still watching."""
+        with self.lock:
+            self.last_viewed = self.viewers_seen[viewer_id] = time.monotonic()
+
+    @property
+    def viewers(self):
+        cutoff = time.monotonic() - VIEWER_TIMEOUT
+        with self.lock:
+            for viewer_id in [v for v, seen in self.viewers_seen.items() if seen < cutoff]:
+                del self.viewers_seen[viewer_id]
+            return len(self.viewers_seen)
+
+
+class BroadcastHub:
+    """The broadcasts running in this process. Only the most recent finished ones are kept."""
+
+    MAX_FINISHED = 20
+
+    def __init__(self):
+        self.broadcasts = {}
+        self.lock = threading.Lock()
+
+    def start(self, ai_module, mode='Chess Teaching', move_interval=MOVE_INTERVAL):
+        """Start a new AI-vs-AI broadcast. `ai_module` should not be shared with a session (see headless_copy)."""
+        broadcast = Broadcast(uuid.uuid4().hex[:8], ai_module, mode, move_interval)
+        with self.lock:
+            self.broadcasts[broadcast.id] = broadcast
+            finished = sorted((b for b in self.broadcasts.values() if b.finished_at), key=lambda b: b.finished_at)
+            for old in finished[:max(len(finished) - self.MAX_FINISHED, 0)]:
+                del self.broadcasts[old.id]
+        logging.info(f"Broadcast {broadcast.id} started (Mode: {mode})")
+        return broadcast.start()
+
+    def get(self, broadcast_id):
+        with self.lock:
+            return self.broadcasts.get(broadcast_id)
+
+    def live(self):
+        with self.lock:
+            return [b for b in self.broadcasts.values() if b.status == 'live']
+
+
+_shared_hub = None
+_shared_hub_lock = threading.Lock()
+
+
+def shared_hub():
+    """One BroadcastHub per process, shared by every session."""
+    global _shared_hub
+    with _shared_hub_lock:
+        if _shared_hub is None:
+            _shared_hub = BroadcastHub()
+    return _shared_hub
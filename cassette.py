@@ -0,0 +1,343 @@
+"""
+Record and replay LLM traffic.
+
+In record mode every exchange with the model is appended to a cassette: one JSON line per
+request with the model, a digest of the prompt, the raw response (or error), the latency,
+for streamed responses the time to the first token, and what the caller tagged it with through
+`exchange()`: the session, request and attempt, and the position (FEN, mode and side to move)
+the request was made for. In replay mode the same file answers the
+requests instead of the model, with the recorded latency or none at all, so sessions can be
+re-run offline to profile and regression-test parsing, retries and the UI.
+
+Configured through the environment, so the app, self-play and the annotator all pick it up:
+
+    LLM_CASSETTE=session.jsonl LLM_CASSETTE_MODE=record streamlit run app.py
+    LLM_CASSETTE=session.jsonl LLM_CASSETTE_MODE=replay LLM_CASSETTE_LATENCY=zero python selfplay.py ...
+    python cassette.py session.jsonl            # per-model summary
+    python cassette.py session.jsonl --drive    # reproduce every recorded request from its position
+
+A request is matched on the model and the prompt digest. Identical prompts (retries with the
+same feedback, repeated positions) are answered in the order they were recorded. Because every
+request records its position, `drive()` can re-run a whole session, human moves included,
+without the app or anyone replaying the moves.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import chess
+
+from fake_llm import TOKEN_PATTERN, FakeResponse
+
+VERSION = 1
+MODES = ('record', 'replay')
+LATENCIES = ('original', 'zero')
+
+
+class CassetteMiss(Exception):
+    """Replay found no recorded exchange for a request."""
+
+
+class ReplayedError(Exception):
+    """An error the model raised while recording, raised again on replay."""
+
+
+_context = threading.local()
+
+
+@contextmanager
+def exchange(session=None, request=None, attempt=None, fen=None, mode=None, color=None):
+    """
+    Tag the exchanges recorded on this thread inside the block: the session, request and attempt,
+    so retries can be told apart, and the position they were made for, so they can be re-driven.
+    """
+    previous = getattr(_context, 'fields', {})
+    fields = {'session': session, 'request': request, 'attempt': attempt, 'fen': fen, 'mode': mode, 'color': color}
+    _context.fields = dict(previous, **{k: v for k, v in fields.items() if v is not None})
+    try:
+        yield
+    finally:
+        _context.fields = previous
+
+
+def prompt_digest(messages):
+    prompt = messages[-1][1] if isinstance(messages, list) else str(messages)
+    return hashlib.sha1(prompt.encode()).hexdigest()
+
+
+class Cassette:
+    """An append-only cassette file. Safe to write from several threads and processes at once."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fd = None
+
+    def append(self, entry):
+        line = (json.dumps(dict(entry, v=VERSION), separators=(',', ':')) + "\n").encode()
+        with self.lock:
+            if self.fd is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            # One write per line on an O_APPEND descriptor, so lines from other processes never interleave
+            os.write(self.fd, line)
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # a line cut short when a recording process was killed
+        return entries
+
+
+class RecordingLLM:
+    """Wraps a client and appends each exchange to a cassette."""
+
+    def __init__(self, llm, cassette, model):
+        self.llm = llm
+        self.cassette = cassette
+        self.model = model
+
+    def record(self, messages, started, response=None, error=None, first_token=None):
+        entry = {
+            't': round(time.time(), 3),
+            'model': self.model,
+            'prompt': prompt_digest(messages),
+            'response': response,
+            'error': f"{type(error).__name__}: {error}" if error is not None else None,
+            'latency': round(time.perf_counter() - started, 4),
+        }
+        if first_token is not None:
+            entry['ttft'] = round(first_token - started, 4)
+        entry.update(getattr(_context, 'fields', {}))
+        self.cassette.append(entry)
+
+    def invoke(self, messages):
+        started = time.perf_counter()
+        try:
+            response = self.llm.invoke(messages)
+        except Exception as e:
+            self.record(messages, started, error=e)
+            raise
+        self.record(messages, started, response=response.content)
+        return response
+
+    def stream(self, messages):
+        started = time.perf_counter()
+        first_token = None
+        text = ""
+        try:
+            for chunk in self.llm.stream(messages):
+                if chunk.content and first_token is None:
+                    first_token = time.perf_counter()
+                text += chunk.content or ""
+                yield chunk
+        except Exception as e:
+            self.record(messages, started, response=text or None, error=e, first_token=first_token)
+            raise
+        self.record(messages, started, response=text, first_token=first_token)
+
+
+class ReplayLLM:
+    """Answers requests from a cassette, with the recorded latency or none."""
+
+    def __init__(self, cassette, model, latency='original'):
+        if latency not in LATENCIES:
+            raise ValueError(f"Unknown replay latency '{latency}'. Expected one of {LATENCIES}.")
+        self.model = model
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.exchanges = defaultdict(deque)
+        for entry in cassette.entries():
+            if entry.get('model') == model:
+                self.exchanges[entry['prompt']].append(entry)
+        self.hits = 0
+        self.misses = 0
+
+    def next_exchange(self, messages):
+        digest = prompt_digest(messages)
+        with self.lock:
+            queue = self.exchanges.get(digest)
+            if not queue:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded response from {self.model} for prompt {digest[:12]}")
+            self.hits += 1
+            # The last recording for a prompt keeps answering once the earlier ones are used up
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def invoke(self, messages):
+        entry = self.next_exchange(messages)
+        if self.latency == 'original':
+            time.sleep(entry['latency'])
+        if entry['error']:
+            raise ReplayedError(entry['error'])
+        return FakeResponse(entry['response'])
+
+    def stream(self, messages):
+        entry = self.next_exchange(messages)
+        chunks = TOKEN_PATTERN.findall(entry['response'] or "")
+        if self.latency == 'original' and chunks:
+            first = entry.get('ttft', entry['latency'])
+            time.sleep(first)
+            rest = max(entry['latency'] - first, 0) / len(chunks)
+        else:
+            rest = 0
+        for i, chunk in enumerate(chunks):
+            if i and rest:
+                time.sleep(rest)
+            yield FakeResponse(chunk)
+        if entry['error']:
+            raise ReplayedError(entry['error'])
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def open_cassette(path):
+    """One Cassette per path in a process, so its writes go through one lock."""
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+def configured_llm(model, create):
+    """
+    The client for `model` as configured by LLM_CASSETTE*: `create()` wrapped for recording,
+    a replay that never calls `create()`, or `create()` unchanged when no cassette is set.
+    """
+    path = os.environ.get('LLM_CASSETTE')
+    if not path:
+        return create()
+    mode = os.environ.get('LLM_CASSETTE_MODE', 'record')
+    if mode not in MODES:
+        raise ValueError(f"Unknown LLM_CASSETTE_MODE '{mode}'. Expected one of {MODES}.")
+    cassette = open_cassette(path)
+    if mode == 'replay':
+        replay = ReplayLLM(cassette, model, os.environ.get('LLM_CASSETTE_LATENCY', 'original'))
+        logging.info(f"Replaying {model} from {path} ({sum(map(len, replay.exchanges.values()))} exchanges)")
+        return replay
+    logging.info(f"Recording {model} to {path}")
+    return RecordingLLM(create(), cassette, model)
+
+
+def request_key(entry):
+    return entry.get('session'), entry.get('request')
+
+
+def drive(path):
+    """
+    Re-run every recorded request from its position against a replay of the cassette, in the
+    order they were recorded. One row per request, with what it returned and whether it took the
+    same number of attempts without any unrecorded prompt.
+    """
+    # Imported here since ai_module imports this module
+    from ai_module import AIModule
+    from headless import HeadlessStreamlit
+
+    cassette = open_cassette(path)
+    entries = [e for e in cassette.entries() if e.get('fen')]
+    recorded_attempts = defaultdict(int)
+    for entry in entries:
+        key = request_key(entry)
+        recorded_attempts[key] = max(recorded_attempts[key], entry.get('attempt') or 1)
+
+    modules = {}
+    rows = []
+    seen = set()
+    for entry in entries:
+        key = request_key(entry)
+        if key in seen:
+            continue
+        seen.add(key)
+        model = entry['model']
+        if model not in modules:
+            # The tables answer their positions without the model, so they are left out of a replay
+            modules[model] = AIModule(
+                HeadlessStreamlit(keep_messages=False), model=model, llm=ReplayLLM(cassette, model, 'zero'),
+                use_endgame_tables=False, coalesce=False
+            )
+        ai_module = modules[model]
+        board = chess.Board(entry['fen'])
+        requests, misses = ai_module.stats['requests'], ai_module.llm.misses
+        if entry['mode'] == 'Suggestions':
+            result = ' '.join(s['move'] for s in ai_module.suggest_moves(board))
+            attempts = 1
+        else:
+            color = chess.WHITE if entry['color'] == 'white' else chess.BLACK
+            move, _ = ai_module.get_ai_move(board, color, entry['mode'])
+            result = move.uci()
+            attempts = ai_module.stats['requests'] - requests
+        rows.append({
+            'request': key[1],
+            'mode': entry['mode'],
+            'fen': entry['fen'],
+            'result': result,
+            'recorded_attempts': recorded_attempts[key],
+            'attempts': attempts,
+            'misses': ai_module.llm.misses - misses,
+        })
+    return rows
+
+
+def summarize(entries):
+    """Per-model request, error and retry counts and latency percentiles."""
+    by_model = defaultdict(list)
+    for entry in entries:
+        by_model[entry['model']].append(entry)
+    rows = []
+    for model, model_entries in sorted(by_model.items()):
+        latencies = sorted(e['latency'] for e in model_entries)
+        rows.append({
+            'model': model,
+            'requests': len(model_entries),
+            'errors': sum(1 for e in model_entries if e['error']),
+            'retries': sum(1 for e in model_entries if e.get('attempt', 1) > 1),
+            'distinct_prompts': len({e['prompt'] for e in model_entries}),
+            'p50_s': latencies[len(latencies) // 2],
+            'p90_s': latencies[min(int(len(latencies) * 0.9), len(latencies) - 1)],
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a recorded LLM cassette.")
+    parser.add_argument('cassette', help="Cassette file (JSON lines).")
+    parser.add_argument('--drive', action='store_true',
+                        help="Re-run every recorded request from its position against the recording.")
+    args = parser.parse_args(argv)
+    if args.drive:
+        rows = drive(args.cassette)
+        differed = 0
+        for row in rows:
+            same = row['attempts'] == row['recorded_attempts'] and not row['misses']
+            differed += not same
+            print(f"{row['mode']} {row['fen']}: {row['result']} ({row['attempts']}/{row['recorded_attempts']} attempts"
+                  f"{'' if same else ', DIFFERS'})")
+        print(f"{len(rows)} requests re-driven, {differed} differed")
+        return 1 if differed or not rows else 0
+    rows = summarize(Cassette(args.cassette).entries())
+    if not rows:
+        print(f"{args.cassette}: no exchanges")
+        return 1
+    for row in rows:
+        print(f"{row['model']}: {row['requests']} requests ({row['distinct_prompts']} distinct prompts), "
+              f"{row['errors']} errors, {row['retries']} retries, p50 {row['p50_s']:.2f}s, p90 {row['p90_s']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,9 @@
 import chess
-import chess.svg
-import chess.pgn  # 
-from langchain_groq import ChatGroq
+import chess.pgn
 import time
-import re
 import logging
-from io import StringIO, BytesIO
-from utils import set_custom_css, display_header
+from io import StringIO
+from move_index import MoveIndex
 
 class ChessGame:
     def __init__(self,st):
@@ -27,6 +24,11 @@ class ChessGame:
         self.timer_black = 0
         self.custom_time = 0
         self.last_move_time = None
+        self._move_index = None
+        # Per-ply analysis from annotator.annotate_game, written into exported PGNs
+        self.annotations = []
+        # White's evaluation after each ply, starting with the initial position; see get_eval_series
+        self.eval_series = []
 
     def reset(self):
         self.board.reset()
@@ -45,8 +47,36 @@ class ChessGame:
         self.timer_black = 0
         self.custom_time = 0
         self.last_move_time = None
+        self._move_index = None
+        self.annotations = []
+        self.eval_series = []
+
+    def get_move_index(self):
+        """Legal-move index for the current position, built at most once per ply."""
+        if self._move_index is None:
+            self._move_index = MoveIndex(self.board)
+        return self._move_index
+
+    def get_eval_series(self):
+        """
+        Evaluation (centipawns, White's view) of every position in the game so far.
+        Only positions added since the last call are scored, all in one batch.
+        """
+        missing = len(self.move_history) + 1 - len(self.eval_series)
+        if missing > 0:
+            # Imported here so numpy is only loaded once a game is actually being evaluated
+            from evaluator import evaluate_batch
+            board = self.board.copy()
+            boards = []
+            for _ in range(missing):
+                boards.append(board.copy(stack=False))
+                if board.move_stack:
+                    board.pop()
+            self.eval_series.extend(int(score) for score in evaluate_batch(boards[::-1]))
+        return self.eval_series
 
     def make_move(self, move):
+        self._move_index = None
         self.board.push(move)
         self.move_history.append(move.uci())
         self.undo_stack.append(move)
@@ -57,8 +87,10 @@ class ChessGame:
     def undo_move(self):
         if self.undo_stack:
             move = self.undo_stack.pop()
+            self._move_index = None
             self.board.pop()
             self.move_history.pop()
+            del self.eval_series[len(self.move_history) + 1:]
             self.redo_stack.append(move)
             self.last_move_time = time.time()
             logging.info(f"Move undone: {move.uci()}")
@@ -68,6 +100,7 @@ class ChessGame:
     def redo_move(self):
         if self.redo_stack:
             move = self.redo_stack.pop()
+            self._move_index = None
             self.board.push(move)
             self.move_history.append(move.uci())
             self.undo_stack.append(move)
@@ -77,21 +110,30 @@ class ChessGame:
             self.st.warning("No moves to redo.")
 
     def export_pgn(self):
+        # Start from the root position so games imported with a [FEN] header export correctly
+        temp_board = self.board.root()
         game = chess.pgn.Game()
+        game.setup(temp_board)
         node = game
-        temp_board = chess.Board()
 
-        for move_uci in self.move_history:
+        for ply, move_uci in enumerate(self.move_history):
             move = chess.Move.from_uci(move_uci)
             node = node.add_variation(move)
             temp_board.push(move)
+            # Annotations only apply while the game still follows the analyzed moves
+            if ply < len(self.annotations) and self.annotations[ply]['move'] == move_uci:
+                annotation = self.annotations[ply]
+                if annotation['comment']:
+                    node.comment = annotation['comment']
+                if annotation['nag']:
+                    node.nags.add(annotation['nag'])
 
         game.headers["Event"] = "Chess Game"
         game.headers["White"] = self.player_white
         game.headers["Black"] = self.player_black
         game.headers["Result"] = temp_board.result()
 
-        exporter = chess.pgn.StringExporter(headers=True, variations=False, comments=False)
+        exporter = chess.pgn.StringExporter(headers=True, variations=False, comments=bool(self.annotations))
         pgn_string = game.accept(exporter)
         logging.info("Game exported to PGN.")
         return pgn_string
@@ -114,9 +156,12 @@ class ChessGame:
                 undo_stack.append(move)
 
             self.board = board
+            self._move_index = None
             self.move_history = move_history
             self.undo_stack = undo_stack
             self.redo_stack = []
+            self.annotations = []
+            self.eval_series = []
             self.game_started = True
             self.game_over = board.is_game_over()
             self.result = board.result() if board.is_game_over() else None
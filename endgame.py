@@ -0,0 +1,334 @@
+"""
+Exact endgame tables for king + one piece against a lone king (KQK, KRK, KPK).
+
+Each table is generated once by retrograde analysis and written to a memory-mapped file
+under ENDGAME_CACHE_DIR, so later processes open it instantly and share the pages.
+Positions are stored with the side that has the extra piece as White; Black-strong
+positions are mirrored before probing.
+
+Every table holds one signed byte per (side to move, white king, piece, black king):
+    ILLEGAL (-128)  not a legal position
+    0               draw
+    n > 0           side to move mates in n plies
+    n < 0           side to move is mated in -n - 1 plies (-1 means checkmated now)
+"""
+import logging
+import mmap
+import os
+import threading
+
+import chess
+
+VERSION = 1
+ENDGAME_CACHE_DIR = os.environ.get(
+    'ENDGAME_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'endgame')
+)
+# Built in this order, since a pawn ending can promote into either of the others
+TABLES = {'KQK': chess.QUEEN, 'KRK': chess.ROOK, 'KPK': chess.PAWN}
+PROMOTION_TABLES = {chess.QUEEN: 'KQK', chess.ROOK: 'KRK'}
+
+ILLEGAL = -128
+TABLE_SIZE = 1 << 19
+WHITE_TO_MOVE, BLACK_TO_MOVE = 0, 1
+NEVER_LOST = 127  # move counter for positions where Black can capture the piece and draw
+
+KING_MOVES = [list(chess.SquareSet(chess.BB_KING_ATTACKS[square])) for square in chess.SQUARES]
+DIRECTIONS = {
+    chess.QUEEN: [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)],
+    chess.ROOK: [(1, 0), (-1, 0), (0, 1), (0, -1)],
+}
+
+
+def index(side, white_king, piece, black_king):
+    return (side << 18) | (white_king << 12) | (piece << 6) | black_king
+
+
+def adjacent(a, b):
+    return chess.square_distance(a, b) <= 1
+
+
+def rays(piece_type, square):
+    """Squares a slider on `square` reaches on an empty board, one list per direction, nearest first."""
+    result = []
+    for df, dr in DIRECTIONS[piece_type]:
+        ray = []
+        file, rank = chess.square_file(square) + df, chess.square_rank(square) + dr
+        while 0 <= file < 8 and 0 <= rank < 8:
+            ray.append(chess.square(file, rank))
+            file, rank = file + df, rank + dr
+        result.append(ray)
+    return result
+
+
+def _attack_lines(piece_type):
+    """For each (from, to), the bitboard of squares that would block an attack, or -1 if there is no attack."""
+    lines = [-1] * 4096
+    for square in chess.SQUARES:
+        if piece_type == chess.PAWN:
+            for target in chess.SquareSet(chess.BB_PAWN_ATTACKS[chess.WHITE][square]):
+                lines[square * 64 + target] = 0
+            continue
+        for ray in rays(piece_type, square):
+            between = 0
+            for target in ray:
+                lines[square * 64 + target] = between
+                between |= chess.BB_SQUARES[target]
+    return lines
+
+
+def piece_squares(piece_type):
+    return range(8, 56) if piece_type == chess.PAWN else range(64)
+
+
+def build_table(piece_type, probe_promotion=None):
+    """
+    Retrograde analysis over every position of king + `piece_type` against king.
+    `probe_promotion(piece_type, white_king, square, black_king)` returns the stored value of the
+    Black-to-move position after a promotion, and is required for pawn tables.
+    Returns the table as a bytearray.
+    """
+    lines = _attack_lines(piece_type)
+    sliders = {square: rays(piece_type, square) for square in chess.SQUARES} if piece_type != chess.PAWN else None
+
+    def attacks(piece, target, blocker):
+        line = lines[piece * 64 + target]
+        return line != -1 and not line & chess.BB_SQUARES[blocker]
+
+    values = [0] * TABLE_SIZE
+    legal = bytearray(TABLE_SIZE)
+    resolved = bytearray(TABLE_SIZE)
+    moves_left = bytearray(TABLE_SIZE)
+    frontier = []
+
+    # Legal positions, Black's move counts, checkmates and stalemates
+    for wk in chess.SQUARES:
+        for wp in piece_squares(piece_type):
+            if wp == wk:
+                continue
+            for bk in chess.SQUARES:
+                if bk == wk or bk == wp or adjacent(wk, bk):
+                    continue
+                in_check = attacks(wp, bk, wk)
+                if not in_check:
+                    legal[index(WHITE_TO_MOVE, wk, wp, bk)] = 1
+                i = index(BLACK_TO_MOVE, wk, wp, bk)
+                legal[i] = 1
+                count = 0
+                for target in KING_MOVES[bk]:
+                    if adjacent(target, wk):
+                        continue
+                    if target == wp:
+                        count = NEVER_LOST
+                        break
+                    if not attacks(wp, target, wk):
+                        count += 1
+                if count == 0:
+                    resolved[i] = 1
+                    if in_check:
+                        values[i] = -1
+                        frontier.append(i)
+                moves_left[i] = count
+
+    # Promotions reach positions in other tables; they enter the search at the ply they mate in
+    seeds = {}
+    if piece_type == chess.PAWN:
+        for wk in chess.SQUARES:
+            for wp in range(48, 56):
+                target = wp + 8
+                if wp == wk or target == wk:
+                    continue
+                for bk in chess.SQUARES:
+                    i = index(WHITE_TO_MOVE, wk, wp, bk)
+                    if not legal[i] or target == bk:
+                        continue
+                    best = None
+                    for promotion in PROMOTION_TABLES:
+                        value = probe_promotion(promotion, wk, target, bk)
+                        if ILLEGAL < value < 0 and (best is None or -value < best):
+                            best = -value
+                    if best is not None:
+                        seeds.setdefault(best, []).append(i)
+
+    ply = 0
+    while frontier or any(level >= ply for level in seeds):
+        for i in seeds.pop(ply, ()):
+            if not resolved[i]:
+                resolved[i] = 1
+                values[i] = ply
+                frontier.append(i)
+        next_frontier = []
+        for i in frontier:
+            side, wk, wp, bk = i >> 18, (i >> 12) & 63, (i >> 6) & 63, i & 63
+            if side == BLACK_TO_MOVE:
+                # Black is lost here: every White move into this position wins
+                predecessors = []
+                for origin in KING_MOVES[wk]:
+                    if origin != wp and origin != bk and not adjacent(origin, bk):
+                        predecessors.append(index(WHITE_TO_MOVE, origin, wp, bk))
+                if piece_type == chess.PAWN:
+                    origin = wp - 8
+                    if origin >= 8 and origin != wk and origin != bk:
+                        predecessors.append(index(WHITE_TO_MOVE, wk, origin, bk))
+                        if chess.square_rank(wp) == 3 and wp - 16 != wk and wp - 16 != bk:
+                            predecessors.append(index(WHITE_TO_MOVE, wk, wp - 16, bk))
+                else:
+                    for ray in sliders[wp]:
+                        for origin in ray:
+                            if origin == wk or origin == bk:
+                                break
+                            predecessors.append(index(WHITE_TO_MOVE, wk, origin, bk))
+                for p in predecessors:
+                    if legal[p] and not resolved[p]:
+                        resolved[p] = 1
+                        values[p] = ply + 1
+                        next_frontier.append(p)
+            else:
+                # White wins here: Black only moves into it when nothing else is left
+                for origin in KING_MOVES[bk]:
+                    if origin == wk or origin == wp or adjacent(origin, wk):
+                        continue
+                    p = index(BLACK_TO_MOVE, wk, wp, origin)
+                    if resolved[p] or moves_left[p] == NEVER_LOST:
+                        continue
+                    moves_left[p] -= 1
+                    if moves_left[p] == 0:
+                        resolved[p] = 1
+                        values[p] = -(ply + 2)  # mated in ply + 1 plies
+                        next_frontier.append(p)
+        frontier = next_frontier
+        ply += 1
+
+    table = bytearray(TABLE_SIZE)
+    for i in range(TABLE_SIZE):
+        table[i] = (values[i] if legal[i] else ILLEGAL) & 0xFF
+    return table
+
+
+def decode(byte):
+    return byte - 256 if byte > 127 else byte
+
+
+class EndgameTables:
+    """
+    Lazily built, memory-mapped endgame tables. `probe` and `best_move` return None until the
+    table for a position exists; the first miss starts building the missing tables in the
+    background, so callers carry on (with the LLM) in the meantime.
+    """
+
+    def __init__(self, cache_dir=ENDGAME_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.build_thread = None
+        self.load()
+
+    def path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.v{VERSION}.bin")
+
+    def load(self):
+        for name in TABLES:
+            if name not in self.tables and os.path.exists(self.path(name)):
+                with open(self.path(name), 'rb') as f:
+                    self.tables[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def ready(self):
+        return len(self.tables) == len(TABLES)
+
+    def build(self):
+        """Generate and save every missing table. Safe to run from several processes at once."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for name, piece_type in TABLES.items():
+            if name in self.tables:
+                continue
+            logging.info(f"Building endgame table {name}")
+
+            def probe_promotion(promotion, white_king, square, black_king):
+                table = self.tables[PROMOTION_TABLES[promotion]]
+                return decode(table[index(BLACK_TO_MOVE, white_king, square, black_king)])
+
+            data = build_table(piece_type, probe_promotion)
+            temp_path = f"{self.path(name)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self.path(name))
+            self.load()
+            logging.info(f"Endgame table {name} saved to {self.path(name)}")
+
+    def ensure_built(self):
+        """Start building missing tables on a background thread, once."""
+        with self.lock:
+            if self.ready or (self.build_thread and self.build_thread.is_alive()):
+                return
+            self.build_thread = threading.Thread(target=self.build, name='endgame-build', daemon=True)
+            self.build_thread.start()
+
+    @staticmethod
+    def signature(board):
+        """Table name and strong side for a king + one piece vs king position, or (None, None)."""
+        if chess.popcount(board.occupied) != 3 or board.castling_rights:
+            return None, None
+        for color in chess.COLORS:
+            for name, piece_type in TABLES.items():
+                if board.pieces_mask(piece_type, color):
+                    return name, color
+        return None, None
+
+    def probe(self, board):
+        """
+        Value of the position for the side to move: ('win' | 'loss' | 'draw', plies to mate),
+        or None if no table covers it (yet).
+        """
+        if board.is_insufficient_material():
+            return 'draw', 0
+        name, strong = self.signature(board)
+        if name is None:
+            return None
+        table = self.tables.get(name)
+        if table is None:
+            self.ensure_built()
+            return None
+        if strong == chess.BLACK:
+            board = board.mirror()
+        piece = next(iter(board.pieces(TABLES[name], chess.WHITE)))
+        side = WHITE_TO_MOVE if board.turn == chess.WHITE else BLACK_TO_MOVE
+        value = decode(table[index(side, board.king(chess.WHITE), piece, board.king(chess.BLACK))])
+        if value == ILLEGAL or value == 0:
+            return 'draw', 0
+        if value > 0:
+            return 'win', value
+        return 'loss', -value - 1
+
+    def best_move(self, board):
+        """
+        The table move for the side to move: the fastest mate when winning, otherwise a drawing
+        move if there is one, otherwise the longest resistance. Returns (move, (result, plies)) or None.
+        """
+        if self.signature(board)[0] is None or self.probe(board) is None:
+            return None
+        best, best_key = None, None
+        for move in board.legal_moves:
+            board.push(move)
+            outcome = self.probe(board)
+            board.pop()
+            if outcome is None:
+                return None
+            result, plies = outcome
+            # Scored from the mover's side: the opponent losing is best, and sooner is better
+            key = {'loss': (2, -plies), 'draw': (1, 0), 'win': (0, plies)}[result]
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best, self.probe(board)
+
+
+_shared_tables = None
+_shared_tables_lock = threading.Lock()
+
+
+def shared_tables():
+    """One EndgameTables per process, so the files are mapped and built only once."""
+    global _shared_tables
+    with _shared_tables_lock:
+        if _shared_tables is None:
+            _shared_tables = EndgameTables()
+    return _shared_tables
@@ -0,0 +1,137 @@
+"""
+Vectorized position evaluation.
+
+Positions are encoded as 12 piece planes of 64 squares and scored together with NumPy:
+material and piece-square tables (the same ones the ranker uses) plus mobility for the
+knights, bishops, rooks and queens. Scores are centipawns from White's point of view.
+"""
+import chess
+import numpy as np
+
+from ranker import MATE_SCORE, PIECE_SQUARE_TABLES, PIECE_VALUES
+
+# Plane order: White pawn..king, then Black pawn..king
+PLANES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+MOBILITY_WEIGHTS = {chess.KNIGHT: 4, chess.BISHOP: 4, chess.ROOK: 2, chess.QUEEN: 1}
+# Scores are clipped to this for display, so one mate does not flatten the rest of the graph
+DISPLAY_CAP = 1000
+
+
+def _square_weights():
+    weights = np.zeros((12, 64), dtype=np.int32)
+    for plane, (color, piece_type) in enumerate(PLANES):
+        table = PIECE_SQUARE_TABLES[piece_type]
+        for square in chess.SQUARES:
+            if color == chess.WHITE:
+                weights[plane, square] = PIECE_VALUES[piece_type] + table[chess.square_mirror(square)]
+            else:
+                weights[plane, square] = -(PIECE_VALUES[piece_type] + table[square])
+    return weights
+
+
+def _attack_geometry():
+    """Knight attacks, slider alignment by line type, and the squares between every pair of squares."""
+    knight = np.zeros((64, 64), dtype=bool)
+    diagonal = np.zeros((64, 64), dtype=bool)
+    straight = np.zeros((64, 64), dtype=bool)
+    between = np.zeros((64 * 64, 64), dtype=np.float32)
+    for source in chess.SQUARES:
+        for target in chess.SquareSet(chess.BB_KNIGHT_ATTACKS[source]):
+            knight[source, target] = True
+        for target in chess.SQUARES:
+            if source == target or not chess.BB_RAYS[source][target]:
+                continue
+            if chess.square_file(source) == chess.square_file(target) or \
+                    chess.square_rank(source) == chess.square_rank(target):
+                straight[source, target] = True
+            else:
+                diagonal[source, target] = True
+            for square in chess.SquareSet(chess.between(source, target)):
+                between[source * 64 + target, square] = 1.0
+    return knight, diagonal, straight, between
+
+
+def _mobility_tables():
+    """Per mobility plane: target squares by source square, whether the path must be clear, and the weight."""
+    plane_ids, reach, sliding, weights = [], [], [], []
+    for color, sign in ((chess.WHITE, 1), (chess.BLACK, -1)):
+        for piece_type, weight in MOBILITY_WEIGHTS.items():
+            plane_ids.append(PLANES.index((color, piece_type)))
+            if piece_type == chess.KNIGHT:
+                reach.append(KNIGHT_ATTACKS)
+            elif piece_type == chess.BISHOP:
+                reach.append(DIAGONAL_LINES)
+            elif piece_type == chess.ROOK:
+                reach.append(STRAIGHT_LINES)
+            else:
+                reach.append(DIAGONAL_LINES | STRAIGHT_LINES)
+            sliding.append(piece_type != chess.KNIGHT)
+            weights.append(sign * weight)
+    return np.array(plane_ids), np.array(reach), np.array(sliding), np.array(weights)
+
+
+SQUARE_WEIGHTS = _square_weights()
+KNIGHT_ATTACKS, DIAGONAL_LINES, STRAIGHT_LINES, BETWEEN = _attack_geometry()
+MOBILITY_PLANES, MOBILITY_REACH, MOBILITY_SLIDING, MOBILITY_SIGNED_WEIGHTS = _mobility_tables()
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+
+def encode(boards):
+    """Piece planes for a list of boards, shape (N, 12, 64), one uint8 per square."""
+    masks = np.array(
+        [[board.pieces_mask(piece_type, color) for color, piece_type in PLANES] for board in boards],
+        dtype=np.uint64,
+    ).reshape(len(boards), 12)
+    return ((masks[:, :, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.uint8)
+
+
+def mobility(planes):
+    """Weighted pseudo-legal mobility, White minus Black, for a batch of piece planes."""
+    white = planes[:, :6].any(axis=1)
+    black = planes[:, 6:].any(axis=1)
+    occupied = (white | black).astype(np.float32)
+    # A slider reaches a square on its line when nothing stands in between
+    unblocked = (occupied @ BETWEEN.T == 0).reshape(-1, 64, 64)
+    # One row per knight, bishop, rook and queen on any board
+    boards, kinds, squares = np.nonzero(planes[:, MOBILITY_PLANES])
+    reach = MOBILITY_REACH[kinds, squares] & (unblocked[boards, squares] | ~MOBILITY_SLIDING[kinds, None])
+    own = np.where((kinds < len(MOBILITY_WEIGHTS))[:, None], white[boards], black[boards])
+    moves = (reach & ~own).sum(axis=1)
+    return np.bincount(boards, weights=moves * MOBILITY_SIGNED_WEIGHTS[kinds], minlength=len(planes)).astype(np.int32)
+
+
+def evaluate_batch(boards):
+    """Centipawn scores from White's point of view for many boards in one pass."""
+    if not boards:
+        return np.zeros(0, dtype=np.int32)
+    planes = encode(boards)
+    scores = np.einsum('npq,pq->n', planes.astype(np.int32), SQUARE_WEIGHTS) + mobility(planes)
+    for i, board in enumerate(boards):
+        # Only positions in check can be mate; the rest skip the legal-move generation
+        if board.is_check() and board.is_checkmate():
+            scores[i] = -MATE_SCORE if board.turn == chess.WHITE else MATE_SCORE
+        elif board.is_stalemate():
+            scores[i] = 0
+    return scores
+
+
+def evaluate(board):
+    return int(evaluate_batch([board])[0])
+
+
+def format_eval(centipawns):
+    """'+0.35' in pawns from White's view, or the result once a side is mated."""
+    if centipawns >= MATE_SCORE:
+        return "1-0"
+    if centipawns <= -MATE_SCORE:
+        return "0-1"
+    return f"{centipawns / 100:+.2f}"
+
+
+def display_score(centipawns):
+    return max(-DISPLAY_CAP, min(DISPLAY_CAP, centipawns))
+
+
+def white_win_share(centipawns):
+    """Share of the eval bar that is White's, between 0 and 1."""
+    return 1 / (1 + 10 ** (-display_score(centipawns) / 400))
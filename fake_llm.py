@@ -0,0 +1,108 @@
+import json
+import random
+import re
+import threading
+import time
+
+
+LEGAL_MOVES_PATTERN = re.compile(r"\*\*(?:Available Legal Moves|Candidate Moves)[^*]*:\*\*\s*([^\n]*)")
+UCI_PATTERN = re.compile(r"\b([a-h][1-8][a-h][1-8][qrbn]?)\b")
+FILES = 'abcdefgh'
+TOKEN_PATTERN = re.compile(r"\s*\S+")
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """
+    Deterministic stand-in for ChatGroq.
+    Reads the listed legal or candidate moves out of the prompt and answers in the format the prompt asks for,
+    with configurable latency, illegal-move rate and malformed-output rate.
+    `policy` picks among the listed moves: 'random', or 'first' to always take the first one.
+    """
+
+    POLICIES = ('random', 'first')
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, illegal_rate=0.0, malformed_rate=0.0, seed=0,
+                 policy='random'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown policy '{policy}'. Expected one of {self.POLICIES}.")
+        self.policy = policy
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.illegal_rate = illegal_rate
+        self.malformed_rate = malformed_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def draw(self, messages):
+        """The response content and delay for one call."""
+        prompt = messages[-1][1] if isinstance(messages, list) else str(messages)
+        with self.lock:
+            self.calls += 1
+            delay = max(self.latency + self.rng.uniform(-self.latency_jitter, self.latency_jitter), 0.0)
+            roll = self.rng.random()
+            content = self.respond(prompt, roll)
+        return content, delay
+
+    def invoke(self, messages):
+        content, delay = self.draw(messages)
+        if delay:
+            time.sleep(delay)
+        return FakeResponse(content)
+
+    def stream(self, messages):
+        """Yield the response a word at a time, spreading the latency over the chunks like a streamed completion."""
+        content, delay = self.draw(messages)
+        chunks = TOKEN_PATTERN.findall(content)
+        for chunk in chunks:
+            if delay:
+                time.sleep(delay / len(chunks))
+            yield FakeResponse(chunk)
+
+    def respond(self, prompt, roll):
+        """Build the raw response text for a prompt. `roll` decides which fault, if any, is injected."""
+        legal_moves = self.extract_legal_moves(prompt)
+        malformed = roll < self.malformed_rate
+        illegal = not malformed and roll < self.malformed_rate + self.illegal_rate
+
+        if 'JSON format' in prompt:
+            if malformed:
+                return '[\n  {"move": "e2e4", "explanation": "Controls the cen'
+            moves = self.pick_moves(legal_moves, 3)
+            if illegal and moves:
+                moves[0] = self.illegal_move(legal_moves)
+            suggestions = [{"move": m, "explanation": f"Candidate move {m}."} for m in moves]
+            return json.dumps(suggestions, indent=2)
+
+        if malformed:
+            return "I would consider several plans here, but the position is unclear."
+        move = self.illegal_move(legal_moves) if illegal or not legal_moves else self.pick_moves(legal_moves, 1)[0]
+        if 'Explanation:' in prompt:
+            return f"Move: {move}\nExplanation: Improves the position of the pieces."
+        return f"Move: {move}"
+
+    def pick_moves(self, legal_moves, count):
+        count = min(count, len(legal_moves))
+        if self.policy == 'first':
+            return legal_moves[:count]
+        return self.rng.sample(legal_moves, count)
+
+    def illegal_move(self, legal_moves):
+        legal = set(legal_moves)
+        while True:
+            move = (f"{self.rng.choice(FILES)}{self.rng.randint(1, 8)}"
+                    f"{self.rng.choice(FILES)}{self.rng.randint(1, 8)}")
+            if move not in legal and move[:2] != move[2:]:
+                return move
+
+    @staticmethod
+    def extract_legal_moves(prompt):
+        match = LEGAL_MOVES_PATTERN.search(prompt)
+        if not match:
+            return []
+        return UCI_PATTERN.findall(match.group(1))
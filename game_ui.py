@@ -1,25 +1,20 @@
 import chess
-import chess.svg
-import chess.pgn  
 import base64
-from langchain_groq import ChatGroq
 import time
-import re
+import os
 import logging
-from io import StringIO, BytesIO  
 from chess_game import ChessGame
 from ai_module import AIModule
-from utils import set_custom_css, display_header
-
-def get_base64_image(image_path):
-    try:
-        with open(image_path, "rb") as image_file:
-            encoded = base64.b64encode(image_file.read()).decode()
-        return encoded
-    except FileNotFoundError:
-        return None
+from utils import set_custom_css, display_header, move_history_html
+from annotator import ANNOTATION_JOBS_DIR, annotate_game, job_key, summary
+from board_component import BoardComponent
+from broadcast import shared_hub
+from simul import MAX_BOARDS, Simul
 
 class GameUI:
+    ANALYSIS_DEPTH = 1
+    ANALYSIS_WORKERS = 4
+
     def __init__(self, game: ChessGame, ai_module: AIModule, st):
         self.st = st
         self.game = game
@@ -27,53 +22,63 @@ class GameUI:
         self.mode = 'Chess Playing' 
         self.ai_explanation = ''
         self.suggestions = []
+        self.boards = {}
+
+    def render_header(self):
+        """Inject the page CSS and header once per rerun."""
         set_custom_css(self)
         display_header(self)
         self.st.write("---")
 
-    def render_board(self, board, size=400):
-        svg = chess.svg.board(board=board, size=size)
-        b64 = base64.b64encode(svg.encode('utf-8')).decode()
-        html_img = f'<img src="data:image/svg+xml;base64,{b64}" />'
-        self.st.markdown(html_img, unsafe_allow_html=True)
+    def board_component(self, key):
+        """The BoardComponent for `key`, kept across reruns so it only sends what changed."""
+        if key not in self.boards:
+            self.boards[key] = BoardComponent(self.st, key)
+        return self.boards[key]
+
+    def human_to_move(self):
+        board = self.game.board
+        player_type = self.game.player_white_type if board.turn == chess.WHITE else self.game.player_black_type
+        return player_type == 'Human' and not board.is_game_over()
+
+    def render_main_board(self, board):
+        """Interactive board; a move clicked on it is played like a typed one."""
+        # Seen from Black's side only when Black is the sole human player
+        black_only = self.game.player_black_type == 'Human' and self.game.player_white_type != 'Human'
+        clicked = self.board_component('main').render(
+            board, interactive=self.human_to_move(), orientation='black' if black_only else 'white'
+        )
+        if clicked:
+            move = self.game.get_move_index().lookup(clicked)
+            if move:
+                self.game.make_move(move)
+                self.suggestions = []
+                self.st.rerun()
+            else:
+                logging.warning(f"Illegal move clicked on the board: {clicked}")
+
+    def render_eval_bar(self, score):
+        from evaluator import format_eval, white_win_share
+        white_pct = white_win_share(score) * 100
+        self.st.markdown(
+            f"<div class='eval-bar'><div class='eval-white' style='width: {white_pct:.1f}%'>{format_eval(score)}</div>"
+            f"<div class='eval-black'></div></div>",
+            unsafe_allow_html=True
+        )
+
+    def render_eval_graph(self, eval_series):
+        """Evaluation after every ply, in pawns from White's point of view."""
+        if len(eval_series) < 2:
+            return
+        from evaluator import display_score
+        self.st.write("### Evaluation")
+        self.st.line_chart({'Evaluation (pawns)': [display_score(s) / 100 for s in eval_series]}, height=200)
 
     def generate_move_history_table(self):
-        import html
-        moves = self.game.move_history
-        temp_board = chess.Board()
-        move_list = []
-        move_number = 1
-        move_pairs = [moves[i:i+2] for i in range(0, len(moves), 2)]
-        for pair in move_pairs:
-            white_move_san = ''
-            black_move_san = ''
-            try:
-                if len(pair) >=1:
-                    move = chess.Move.from_uci(pair[0])
-                    san_move = temp_board.san(move)
-                    temp_board.push(move)
-                    white_move_san = san_move
-            except ValueError:
-                white_move_san = "Invalid Move"
-            try:
-                if len(pair) == 2:
-                    move = chess.Move.from_uci(pair[1])
-                    san_move = temp_board.san(move)
-                    temp_board.push(move)
-                    black_move_san = san_move
-            except ValueError:
-                black_move_san = "Invalid Move"
-            move_list.append({'Move': move_number, 'White': white_move_san, 'Black': black_move_san})
-            move_number +=1
-        table_html = '<div class="move-history-table">'
-        table_html += '<table>'
-        table_html += '<tr><th>Move</th><th>White</th><th>Black</th></tr>'
-        for row in move_list:
-            table_html += f"<tr><td>{row['Move']}</td><td>{html.escape(row['White'])}</td><td>{html.escape(row['Black'])}</td></tr>"
-        table_html += '</table></div>'
-        return table_html
+        return move_history_html(self.game.move_history, self.game.board.root().fen())
 
     def initial_setup(self):
+        self.render_header()
         self.st.header("Game Setup")
         with self.st.form("setup_form"):
             col1, col2 = self.st.columns(2)
@@ -108,6 +113,13 @@ class GameUI:
                 )
             else:
                 custom_time = 0
+            simul_boards = self.st.number_input(
+                "Simultaneous boards (a human against the AI on every board)",
+                min_value=1, max_value=MAX_BOARDS, value=1, step=1, key="simul_boards_input"
+            )
+            broadcast = self.st.checkbox(
+                "Broadcast to spectators (AI vs AI only, with commentary)", key="broadcast_input"
+            )
             self.st.markdown("### Import Game")
             uploaded_pgn = self.st.file_uploader("Upload a PGN file to import a game:", type=["pgn"])
             submitted = self.st.form_submit_button("Start Game")
@@ -116,6 +128,27 @@ class GameUI:
                     self.st.error("Please enter a name for the White player.")
                 elif player_black_type == 'Human' and not player_black.strip():
                     self.st.error("Please enter a name for the Black player.")
+                elif simul_boards > 1 and player_white_type == player_black_type:
+                    self.st.error("A simultaneous exhibition needs one Human and one AI side.")
+                elif simul_boards > 1:
+                    human_white = player_white_type == 'Human'
+                    self.st.session_state.simul = Simul(
+                        self.st, self.ai_module, int(simul_boards),
+                        human_color=chess.WHITE if human_white else chess.BLACK,
+                        player_name=(player_white if human_white else player_black).strip()
+                    )
+                    logging.info(f"Simul started on {int(simul_boards)} boards")
+                    self.st.rerun()
+                elif broadcast and (player_white_type == 'Human' or player_black_type == 'Human'):
+                    self.st.error("Only AI vs AI games can be broadcast.")
+                elif broadcast:
+                    # The game runs once in the process; this session joins it as the first spectator
+                    started = shared_hub().start(self.ai_module.headless_copy())
+                    logging.info(f"Broadcast {started.id} started by user")
+                    # Only the session that started a broadcast may stop it
+                    self.st.session_state.setdefault('hosted_broadcasts', set()).add(started.id)
+                    self.st.query_params['watch'] = started.id
+                    self.st.rerun()
                 else:
                     self.game.player_white_type = player_white_type
                     self.game.player_black_type = player_black_type
@@ -151,8 +184,7 @@ class GameUI:
 
     def main_game(self):
         board = self.game.board
-        set_custom_css(self)
-        display_header(self)
+        self.render_header()
         self.game.update_timers()
         mode_col, main_col, suggestions_col = self.st.columns([1, 3, 2])
         with mode_col:
@@ -178,6 +210,9 @@ class GameUI:
                 href = f'<a href="data:text/plain;base64,{b64_pgn}" download="game.pgn">Click here to download your PGN file</a>'
                 self.st.markdown(href, unsafe_allow_html=True)
                 logging.info("PGN file downloaded by user.")
+            self.render_analysis()
+            if self.ai_module.router is not None:
+                self.render_router_status()
         with main_col:
             col_white, col_black = self.st.columns(2)
             with col_white:
@@ -192,10 +227,15 @@ class GameUI:
                     self.st.markdown(f"Timer: **{self.game.format_time(self.game.timer_black)}**")
                 else:
                     self.st.markdown("Timer: **No Timer**")
-            self.render_board(board)
+            eval_series = self.game.get_eval_series()
+            self.render_eval_bar(eval_series[-1])
+            self.render_main_board(board)
+            if self.mode == 'Chess Teaching' and self.ai_explanation:
+                self.st.markdown(f"**Explanation:** {self.ai_explanation}")
             self.st.write("### Move History")
             move_history_html = self.generate_move_history_table()
             self.st.markdown(move_history_html, unsafe_allow_html=True)
+            self.render_eval_graph(eval_series)
             if board.is_game_over():
                 self.game.game_over = True
                 result = board.result(claim_draw=True)
@@ -219,10 +259,10 @@ class GameUI:
                 if player_type == 'Human':
                     move_col, make_move_col, suggestions_button_col = self.st.columns([2, 1, 1])
                     with move_col:
-                        user_move = self.st.text_input("Enter move (UCI or SAN format):", key="user_move_white")
+                        user_move = self.st.text_input("Click the board or enter a move (UCI or SAN):", key="user_move_white")
                     with make_move_col:
                         if self.st.button("Make Move", key="make_move_white"):
-                            move = self.ai_module.parse_move(user_move.strip(), board)
+                            move = self.ai_module.parse_move(user_move.strip(), board, self.game.get_move_index())
                             if move:
                                 self.game.make_move(move)
                                 self.suggestions = []
@@ -233,17 +273,22 @@ class GameUI:
                     with suggestions_button_col:
                         if self.mode == 'Chess Teaching':
                             if self.st.button("Get AI Suggestions", key="get_suggestions_white"):
-                                self.suggestions = self.ai_module.suggest_moves(board)
+                                self.suggestions = self.stream_suggestions(board, suggestions_col)
                                 logging.info("AI Suggestions requested by user.")
+                                if self.suggestions:
+                                    # Redraw them with their Play buttons
+                                    self.st.rerun()
                 else:
                     with self.st.spinner(f"{player_name} (AI) is thinking..."):
-                        ai_move, explanation = self.ai_module.get_ai_move(board, chess.WHITE, self.mode)
+                        ai_move, explanation = self.ai_module.get_ai_move(
+                            board, chess.WHITE, self.mode, move_index=self.game.get_move_index(),
+                            time_left=self.game.timer_white or None, on_text=self.streaming_text(player_name)
+                        )
                         if ai_move:
                             self.game.make_move(ai_move)
                             self.st.success(f"{player_name} (AI) plays: **{ai_move.uci()}**")
                             logging.info(f"AI played move: {ai_move.uci()}")
-                            if self.mode == 'Chess Teaching' and explanation:
-                                self.st.markdown(f"**Explanation:** {explanation}")
+                            self.ai_explanation = explanation if self.mode == 'Chess Teaching' and explanation else ''
                             self.st.rerun()
             else:
                 player_type = self.game.player_black_type
@@ -252,10 +297,10 @@ class GameUI:
                 if player_type == 'Human':
                     move_col, make_move_col = self.st.columns([2, 1])
                     with move_col:
-                        user_move = self.st.text_input("Enter move (UCI or SAN format):", key="user_move_black")
+                        user_move = self.st.text_input("Click the board or enter a move (UCI or SAN):", key="user_move_black")
                     with make_move_col:
                         if self.st.button("Make Move", key="make_move_black"):
-                            move = self.ai_module.parse_move(user_move.strip(), board)
+                            move = self.ai_module.parse_move(user_move.strip(), board, self.game.get_move_index())
                             if move:
                                 self.game.make_move(move)
                                 self.suggestions = []
@@ -265,39 +310,118 @@ class GameUI:
                                 logging.warning(f"Invalid move entered by {player_name}: {user_move.strip()}")
                 else:
                     with self.st.spinner(f"{player_name} (AI) is thinking..."):
-                        ai_move, explanation = self.ai_module.get_ai_move(board, chess.BLACK, self.mode)
+                        ai_move, explanation = self.ai_module.get_ai_move(
+                            board, chess.BLACK, self.mode, move_index=self.game.get_move_index(),
+                            time_left=self.game.timer_black or None, on_text=self.streaming_text(player_name)
+                        )
                         if ai_move:
                             self.game.make_move(ai_move)
                             self.st.success(f"{player_name} (AI) plays: **{ai_move.uci()}**")
                             logging.info(f"AI played move: {ai_move.uci()}")
-                            if self.mode == 'Chess Teaching' and explanation:
-                                self.st.markdown(f"**Explanation:** {explanation}")
+                            self.ai_explanation = explanation if self.mode == 'Chess Teaching' and explanation else ''
                             self.st.rerun()
         with suggestions_col:
             if self.mode == 'Chess Teaching' and self.suggestions:
+                move_index = self.game.get_move_index()
                 self.st.write("### AI Move Suggestions:")
                 for i, suggestion in enumerate(self.suggestions):
-                    suggestion_col, preview_col = self.st.columns([1, 1.5])
-                    with suggestion_col:
-                        if self.st.button(f"Play {suggestion['move']}", key=f"suggestion_move_{i}"):
-                            move = self.ai_module.parse_move(suggestion['move'], board)
-                            if move:
-                                self.game.make_move(move)
-                                self.suggestions = []
-                                self.st.rerun()
-                            else:
-                                self.st.error("Invalid move selected from suggestions.")
-                                logging.warning(f"Invalid suggestion move selected: {suggestion['move']}")
-                        self.st.markdown(f"<div class='small-font'>{suggestion['explanation']}</div>", unsafe_allow_html=True)
-                    with preview_col:
-                        temp_board = board.copy()
-                        move = self.ai_module.parse_move(suggestion['move'], temp_board)
-                        if move:
-                            temp_board.push(move)
-                            self.render_board(temp_board, size=200)
-                        else:
-                            self.st.write("Invalid move preview.")
-                    self.st.markdown("<div class='suggestion-separator'></div>", unsafe_allow_html=True)
+                    self.render_suggestion(i, suggestion, board, move_index)
+
+    def render_suggestion(self, i, suggestion, board, move_index, playable=True):
+        suggestion_col, preview_col = self.st.columns([1, 1.5])
+        with suggestion_col:
+            if not playable:
+                self.st.markdown(f"**{suggestion['move']}**")
+            elif self.st.button(f"Play {suggestion['move']}", key=f"suggestion_move_{i}"):
+                move = move_index.lookup(suggestion['move'])
+                if move:
+                    self.game.make_move(move)
+                    self.suggestions = []
+                    self.st.rerun()
+                else:
+                    self.st.error("Invalid move selected from suggestions.")
+                    logging.warning(f"Invalid suggestion move selected: {suggestion['move']}")
+            self.st.markdown(f"<div class='small-font'>{suggestion['explanation']}</div>", unsafe_allow_html=True)
+        with preview_col:
+            move = move_index.lookup(suggestion['move'])
+            if move:
+                temp_board = board.copy(stack=False)
+                temp_board.push(move)
+                self.board_component(f'preview_{i}').render(temp_board, size=200)
+            else:
+                self.st.write("Invalid move preview.")
+        self.st.markdown("<div class='suggestion-separator'></div>", unsafe_allow_html=True)
+
+    def streaming_text(self, player_name):
+        """An `on_text` callback that shows a teaching response as it streams in, or None outside teaching mode."""
+        if self.mode != 'Chess Teaching':
+            return None
+        placeholder = self.st.empty()
+
+        def on_text(text):
+            placeholder.markdown(f"**{player_name} (AI):**  \n" + text.strip().replace("\n", "  \n"))
+
+        return on_text
+
+    def stream_suggestions(self, board, container):
+        """Ask for suggestions, showing each one in `container` as soon as it has been parsed."""
+        move_index = self.game.get_move_index()
+        with container:
+            self.st.write("### AI Move Suggestions:")
+            shown = self.st.container()
+        count = 0
+
+        def on_suggestion(suggestion):
+            nonlocal count
+            with shown:
+                # Not playable yet: the buttons come with the rerun once the list is complete
+                self.render_suggestion(count, suggestion, board, move_index, playable=False)
+            count += 1
+
+        return self.ai_module.suggest_moves(board, move_index, on_suggestion=on_suggestion)
+
+    def render_analysis(self):
+        """Annotate the whole game; an interrupted analysis resumes from its job file on the next click."""
+        self.st.write("### Analysis")
+        explain = self.st.checkbox("Explain mistakes with the AI coach", key="analysis_explain")
+        if self.st.button("Analyze Game", key="analyze_game"):
+            moves = list(self.game.move_history)
+            if not moves:
+                self.st.warning("No moves to analyze yet.")
+                return
+            progress_bar = self.st.progress(0.0, text="Analyzing game...")
+
+            def progress(done, total):
+                progress_bar.progress(done / total, text=f"Analyzed {done}/{total} plies")
+
+            # Games imported with a [FEN] header start from that position, not the standard one
+            starting_fen = self.game.board.root().fen()
+            job_key_str = job_key(moves, self.ANALYSIS_DEPTH, explain, starting_fen)
+            job_path = os.path.join(ANNOTATION_JOBS_DIR, f"{job_key_str}.jsonl")
+            coach = self.ai_module.headless_copy() if explain else None
+            self.game.annotations = annotate_game(
+                moves, self.ANALYSIS_DEPTH, coach, self.ANALYSIS_WORKERS, job_path, progress, starting_fen
+            )
+            os.remove(job_path)
+            counts = summary(self.game.annotations)
+            self.st.success("Analysis complete: " + ", ".join(f"{symbol} {count}" for symbol, count in counts.items()))
+            pgn_string = self.game.export_pgn()
+            b64_pgn = base64.b64encode(pgn_string.encode()).decode()
+            href = f'<a href="data:text/plain;base64,{b64_pgn}" download="annotated_game.pgn">Download the annotated PGN</a>'
+            self.st.markdown(href, unsafe_allow_html=True)
+            logging.info(f"Game analyzed: {counts}")
+
+    def render_router_status(self):
+        """Show what the model router has measured so far."""
+        self.st.write("### Model Routing")
+        rows = []
+        for entry in self.ai_module.router.report():
+            p50 = f"{entry['p50_s']:.2f}s" if entry['p50_s'] is not None else "-"
+            status = f"benched {entry['benched_s']:.0f}s" if entry['benched_s'] else f"{entry['samples']} samples"
+            rows.append(f"| {entry['model']} | {p50} | {entry['illegal_rate']:.0%} | {entry['error_rate']:.0%} | {status} |")
+        self.st.markdown(
+            "| Model | p50 | Illegal | Errors | Status |\n|---|---|---|---|---|\n" + "\n".join(rows)
+        )
 
     def reset_game(self):
         self.game.reset()
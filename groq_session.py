@@ -0,0 +1,77 @@
+"""
+Shared HTTP plumbing for talking to the Groq API outside of the LLM client.
+
+One pooled `requests.Session` per process keeps connections (and their TLS sessions)
+alive between requests, and the model catalog is cached per API key for CATALOG_TTL
+seconds, so revisiting the model selection screen does not go back to the network.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+CATALOG_TTL = 600
+REQUEST_TIMEOUT = 10
+
+_session = None
+_session_lock = threading.Lock()
+_catalog = {}
+_catalog_lock = threading.Lock()
+
+
+class InvalidApiKey(Exception):
+    """The API rejected the key (HTTP 401 or 403)."""
+
+
+def http_session():
+    """The process-wide pooled session, created on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            _session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+            _session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return _session
+
+
+def catalog_key(api_key, base_url):
+    # Keys are only held as digests, so the cache never keeps the secret itself
+    return hashlib.sha256(f"{base_url}|{api_key}".encode()).hexdigest()
+
+
+def fetch_models(api_key, base_url, ttl=CATALOG_TTL):
+    """
+    Ids of the active models for this key, from the cache when fetched within `ttl` seconds.
+    Raises InvalidApiKey for a rejected key and requests.RequestException for other failures.
+    """
+    key = catalog_key(api_key, base_url)
+    now = time.monotonic()
+    with _catalog_lock:
+        cached = _catalog.get(key)
+    if cached and cached[0] > now:
+        return list(cached[1])
+
+    started = time.perf_counter()
+    response = http_session().get(
+        f"{base_url}/openai/v1/models",
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        timeout=REQUEST_TIMEOUT,
+    )
+    if response.status_code in (401, 403):
+        raise InvalidApiKey(f"The API key was rejected (HTTP {response.status_code}).")
+    response.raise_for_status()
+    models = [model['id'] for model in response.json().get('data', []) if model.get('active', False)]
+    logging.info(f"Fetched {len(models)} models in {time.perf_counter() - started:.2f}s")
+    with _catalog_lock:
+        _catalog[key] = (now + ttl, models)
+    return list(models)
+
+
+def validate_key(api_key, base_url):
+    """
+    Check the key against the API. Returns the model catalog, which is cached for the model
+    selection screen that follows, so validating costs no extra request.
+    """
+    return fetch_models(api_key, base_url)
@@ -0,0 +1,280 @@
+"""
+Local stand-in for the Groq OpenAI-compatible API.
+
+Implements `GET /openai/v1/models` and `POST /openai/v1/chat/completions` (including
+`"stream": true`) and answers chess prompts with moves from FakeLLM, while injecting
+latency, 429s, timeouts and malformed output. Point the app at it with:
+
+    python groq_stub_server.py --port 8787 --latency lognormal:0.4:0.5 --rate-limit-rate 0.05
+    GROQ_API_BASE=http://127.0.0.1:8787 streamlit run app.py
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_llm import FakeLLM
+
+DEFAULT_MODELS = ('llama-3.1-8b-instant', 'llama-3.3-70b-versatile', 'gemma2-9b-it')
+
+
+class LatencyDistribution:
+    """
+    Parses and samples latency specs of the form:
+        fixed:SECONDS
+        uniform:LOW:HIGH
+        lognormal:MEDIAN:SIGMA
+    """
+
+    def __init__(self, spec, rng):
+        self.spec = spec
+        self.rng = rng
+        kind, *params = spec.split(':')
+        try:
+            self.params = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec '{spec}'.")
+        expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec '{spec}'.")
+        self.kind = kind
+
+    def sample(self):
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return self.rng.uniform(*self.params)
+        median, sigma = self.params
+        return self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+class StubConfig:
+    def __init__(self, models=DEFAULT_MODELS, latency='fixed:0', rate_limit_rate=0.0, timeout_rate=0.0,
+                 timeout_seconds=30.0, malformed_rate=0.0, illegal_rate=0.0, policy='random',
+                 stream_chunk_size=8, api_key=None, seed=0, model_latency=None):
+        self.models = list(models)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.latency = LatencyDistribution(latency, self.rng)
+        # Per-model overrides of `latency`, e.g. {'llama-3.3-70b-versatile': 'lognormal:1.2:0.3'}
+        self.model_latency = {model: LatencyDistribution(spec, self.rng)
+                              for model, spec in (model_latency or {}).items()}
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.stream_chunk_size = stream_chunk_size
+        self.api_key = api_key
+        self.llm = FakeLLM(illegal_rate=illegal_rate, malformed_rate=malformed_rate, seed=seed, policy=policy)
+        self.counters = {'models': 0, 'completions': 0, 'rate_limited': 0, 'timeouts': 0, 'unauthorized': 0}
+
+    def draw_fault(self, model=None):
+        """Decide, under the lock so runs are reproducible per seed, which fault a request gets."""
+        with self.lock:
+            roll = self.rng.random()
+            delay = self.model_latency.get(model, self.latency).sample()
+        if roll < self.rate_limit_rate:
+            return 'rate_limit', delay
+        if roll < self.rate_limit_rate + self.timeout_rate:
+            return 'timeout', delay
+        return None, delay
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None  # set by make_server
+
+    def log_message(self, format, *args):
+        logging.info("groq-stub: " + format, *args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, error_type, headers=None):
+        self.send_json(status, {'error': {'message': message, 'type': error_type}}, headers)
+
+    def authorized(self):
+        auth = self.headers.get('Authorization', '')
+        token = auth[len('Bearer '):] if auth.startswith('Bearer ') else ''
+        if not token or (self.config.api_key is not None and token != self.config.api_key):
+            self.config.count('unauthorized')
+            self.send_error_json(401, "Invalid API Key", 'invalid_request_error')
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/openai/v1/models':
+            self.send_error_json(404, f"Unknown path {self.path}", 'not_found')
+            return
+        if not self.authorized():
+            return
+        self.config.count('models')
+        created = int(time.time())
+        data = [{'id': m, 'object': 'model', 'created': created, 'owned_by': 'groq-stub', 'active': True,
+                 'context_window': 8192} for m in self.config.models]
+        self.send_json(200, {'object': 'list', 'data': data})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        if self.path.rstrip('/') != '/openai/v1/chat/completions':
+            self.send_error_json(404, f"Unknown path {self.path}", 'not_found')
+            return
+        if not self.authorized():
+            return
+        try:
+            request = json.loads(raw or b'{}')
+        except json.JSONDecodeError:
+            self.send_error_json(400, "Request body is not valid JSON", 'invalid_request_error')
+            return
+        model = request.get('model')
+        if model not in self.config.models:
+            self.send_error_json(404, f"The model `{model}` does not exist", 'invalid_request_error')
+            return
+
+        fault, delay = self.config.draw_fault(model)
+        if fault == 'rate_limit':
+            self.config.count('rate_limited')
+            self.send_error_json(429, "Rate limit reached. Please try again later.", 'rate_limit_exceeded',
+                                 headers={'Retry-After': '1'})
+            return
+        if fault == 'timeout':
+            # Hold the connection open past any sensible client timeout, then drop it
+            self.config.count('timeouts')
+            time.sleep(self.config.timeout_seconds)
+            self.close_connection = True
+            return
+
+        self.config.count('completions')
+        messages = request.get('messages') or [{}]
+        prompt = messages[-1].get('content') or ''
+        content = self.config.llm.invoke([('user', prompt)]).content
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        usage = {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                 'total_tokens': (len(prompt) + len(content)) // 4}
+
+        if request.get('stream'):
+            self.stream_completion(completion_id, model, content, delay, usage)
+            return
+        time.sleep(delay)
+        self.send_json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                         'finish_reason': 'stop', 'logprobs': None}],
+            'usage': usage,
+        })
+
+    def stream_completion(self, completion_id, model, content, delay, usage):
+        """Send the answer as server-sent events, spreading the latency over the chunks."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        size = max(self.config.stream_chunk_size, 1)
+        pieces = [content[i:i + size] for i in range(0, len(content), size)] or ['']
+        created = int(time.time())
+
+        def event(delta, finish_reason=None, extra=None):
+            chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                     'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason, 'logprobs': None}]}
+            if extra:
+                chunk.update(extra)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        event({'role': 'assistant', 'content': ''})
+        for piece in pieces:
+            time.sleep(delay / len(pieces))
+            event({'content': piece})
+        event({}, finish_reason='stop', extra={'x_groq': {'usage': usage}})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def make_server(config, host='127.0.0.1', port=8787):
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(config, host='127.0.0.1', port=0):
+    """Start a stub server on a background thread. Returns (server, base_url); call server.shutdown() to stop."""
+    server = make_server(config, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local Groq API stand-in with fault injection.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--models', default=','.join(DEFAULT_MODELS), help="Comma-separated model ids.")
+    parser.add_argument('--latency', default='fixed:0',
+                        help="fixed:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA (seconds).")
+    parser.add_argument('--model-latency', action='append', default=[], metavar='MODEL=SPEC',
+                        help="Latency spec for one model, overriding --latency (repeatable).")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fraction of completions answered 429.")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="Fraction of completions that hang.")
+    parser.add_argument('--timeout-seconds', type=float, default=30.0, help="How long a hanging request hangs.")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Fraction of malformed model answers.")
+    parser.add_argument('--illegal-rate', type=float, default=0.0, help="Fraction of answers with an illegal move.")
+    parser.add_argument('--policy', choices=FakeLLM.POLICIES, default='random', help="How moves are picked.")
+    parser.add_argument('--api-key', help="Only accept this key (default: accept any non-empty key).")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = StubConfig(
+        models=[m.strip() for m in args.models.split(',') if m.strip()],
+        latency=args.latency,
+        model_latency=dict(item.split('=', 1) for item in args.model_latency),
+        rate_limit_rate=args.rate_limit_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        malformed_rate=args.malformed_rate,
+        illegal_rate=args.illegal_rate,
+        policy=args.policy,
+        api_key=args.api_key,
+        seed=args.seed,
+    )
+    server = make_server(config, args.host, args.port)
+    print(f"Groq stub listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Counters: {config.counters}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import logging
+from contextlib import contextmanager
+
+
+class HeadlessStop(Exception):
+    """Raised by HeadlessStreamlit.stop(), mirroring st.stop() outside of a Streamlit script run."""
+
+
+class HeadlessStreamlit:
+    """
+    Minimal stand-in for the `st` object that ChessGame, AIModule and GameUI expect.
+    Messages are sent to logging and kept in `messages` instead of being rendered.
+    """
+
+    def __init__(self, keep_messages=True):
+        self.keep_messages = keep_messages
+        self.messages = []
+
+    def _record(self, level, body):
+        if self.keep_messages:
+            self.messages.append((level, body))
+
+    def warning(self, body, *args, **kwargs):
+        self._record('warning', body)
+        logging.warning(body)
+
+    def error(self, body, *args, **kwargs):
+        self._record('error', body)
+        logging.error(body)
+
+    def info(self, body, *args, **kwargs):
+        self._record('info', body)
+
+    def success(self, body, *args, **kwargs):
+        self._record('success', body)
+
+    def write(self, *args, **kwargs):
+        self._record('write', ' '.join(str(a) for a in args))
+
+    def markdown(self, body, *args, **kwargs):
+        self._record('markdown', body)
+
+    @contextmanager
+    def spinner(self, text=""):
+        yield
+
+    def stop(self):
+        raise HeadlessStop()
+
+    def clear(self):
+        self.messages = []
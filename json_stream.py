@@ -0,0 +1,55 @@
+import json
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for a JSON array of objects arriving piece by piece, as in a streamed
+    LLM response. `update(text)` takes the whole response so far and returns the objects
+    completed since the previous call, so each one can be shown as soon as its closing brace
+    arrives. Anything before the opening '[' (such as a code fence) is skipped.
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_start = None
+        self.complete = False
+        self.objects = []
+
+    def update(self, text):
+        completed = []
+        for i in range(self.position, len(text)):
+            char = text[i]
+            if self.complete:
+                break
+            if not self.started:
+                self.started = char == '['
+                continue
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                if self.depth == 0:
+                    self.object_start = i
+                self.depth += 1
+            elif char == '}' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        completed.append(json.loads(text[self.object_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass  # left to the caller's check of the full response
+            elif char == ']' and self.depth == 0:
+                self.complete = True
+        self.position = len(text)
+        self.objects.extend(completed)
+        return completed
@@ -0,0 +1,318 @@
+"""
+Multi-session load harness for the Streamlit app.
+
+Starts `streamlit run app.py` against a local groq_stub_server.py and connects many
+simulated browser sessions to it over Streamlit's websocket protocol. Each session
+goes through API-key entry, model selection, game setup and a sequence of moves,
+undos and suggestion requests, exactly as `app.main` sees them from a real browser.
+Concurrency is ramped level by level while the server process is sampled for CPU
+and memory.
+
+    python loadtest.py --levels 1,4,16,32 --moves 6 --latency lognormal:0.3:0.4 --output load.json
+
+Requires the `websockets` package in addition to the app requirements.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import chess
+
+from groq_stub_server import StubConfig, start_in_thread
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+SAN_CELL_PATTERN = re.compile(r"<td>([^<]*)</td>")
+
+
+class ServerProcess:
+    """A `streamlit run app.py` subprocess whose CPU time and RSS can be sampled from /proc."""
+
+    def __init__(self, port, env):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', APP_SCRIPT,
+             '--server.port', str(port), '--server.headless', 'true',
+             '--server.enableXsrfProtection', 'false', '--browser.gatherUsageStats', 'false'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def wait_until_healthy(self, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Streamlit server exited during startup.")
+            try:
+                with urllib.request.urlopen(f"{self.url}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        raise TimeoutError("Streamlit server did not become healthy in time.")
+
+    def cpu_seconds(self):
+        with open(f"/proc/{self.process.pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+    def rss_kb(self):
+        with open(f"/proc/{self.process.pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+        return 0
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class SimulatedSession:
+    """
+    One browser session speaking Streamlit's websocket protocol.
+    Keeps the client-side widget values between reruns the way the frontend does.
+    """
+
+    def __init__(self, session_id, url, args):
+        self.session_id = session_id
+        self.url = url.replace('http', 'ws', 1) + '/_stcore/stream'
+        self.args = args
+        self.ws = None
+        self.widgets = {}
+        self.values = {}
+        self.markdown = []
+        self.latencies = []
+        self.errors = []
+
+    async def connect(self):
+        import websockets
+        self.ws = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def widget(self, key=None, label=None, kind=None):
+        for widget_id, (widget_kind, proto) in self.widgets.items():
+            if ((key and widget_id.endswith(f"-{key}")) or (label and proto.label == label)
+                    or (kind and widget_kind == kind)):
+                return widget_id, widget_kind, proto
+        raise KeyError(key or label or kind)
+
+    def set_value(self, value, key=None, kind=None):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        widget_id, widget_kind, proto = self.widget(key=key, kind=kind)
+        state = WidgetState(id=widget_id)
+        if widget_kind in ('radio', 'selectbox'):
+            # Newer Streamlit versions send the option itself, older ones its index
+            if 'raw_value' in proto.DESCRIPTOR.fields_by_name:
+                state.string_value = value
+            else:
+                state.int_value = list(proto.options).index(value)
+        else:
+            state.string_value = value
+        self.values[widget_id] = state
+
+    async def rerun(self, click_key=None, click_label=None):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        states = list(self.values.values())
+        if click_key or click_label:
+            widget_id, _, _ = self.widget(key=click_key, label=click_label)
+            states.append(WidgetState(id=widget_id, trigger_value=True))
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.page_script_hash = ''
+        message.rerun_script.widget_states.widgets.extend(states)
+
+        self.widgets, self.markdown = {}, []
+        await self.ws.send(message.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(self.ws.recv(), self.args.rerun_timeout))
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_kind = element.WhichOneof('type')
+                if element_kind == 'exception':
+                    raise RuntimeError(element.exception.message)
+                if element_kind == 'markdown':
+                    self.markdown.append(element.markdown.body)
+                elif element_kind in ('button', 'text_input', 'radio', 'selectbox'):
+                    proto = getattr(element, element_kind)
+                    self.widgets[proto.id] = (element_kind, proto)
+            elif kind == 'script_finished':
+                if forward.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    self.widgets, self.markdown = {}, []
+                    continue
+                return
+
+    async def step(self, label, coroutine):
+        start = time.perf_counter()
+        try:
+            await coroutine
+        except Exception as e:
+            self.errors.append(f"{label}: {type(e).__name__}: {e}")
+            return False
+        self.latencies.append((label, time.perf_counter() - start))
+        return True
+
+    def board(self):
+        """Rebuild the game from the move history table the page rendered."""
+        board = chess.Board()
+        table = next((body for body in self.markdown if 'move-history-table' in body), '')
+        cells = SAN_CELL_PATTERN.findall(table)
+        for row in range(0, len(cells), 3):
+            for san in cells[row + 1:row + 3]:
+                if san:
+                    board.push_san(san)
+        return board
+
+    async def run(self):
+        args = self.args
+        try:
+            await self.connect()
+            if not await self.step('load', self.rerun()):
+                return self
+            self.set_value(args.api_key, kind='text_input')
+            if not await self.step('api_key', self.rerun(click_label='Submit')):
+                return self
+            if not await self.step('model', self.rerun(click_label='Select Model')):
+                return self
+            self.set_value(f"Player {self.session_id}", key='player_white_input')
+            self.set_value('AI', key='player_black_type_input')
+            if not await self.step('setup', self.rerun(click_label='Start Game')):
+                return self
+
+            for ply in range(args.moves):
+                if ply % 3 == 1 and args.suggestions:
+                    self.set_value('Chess Teaching', key='mode_radio')
+                    if not await self.step('mode', self.rerun()):
+                        return self
+                    if not await self.step('suggest', self.rerun(click_key='get_suggestions_white')):
+                        return self
+                board = self.board()
+                if board.is_game_over():
+                    break
+                moves = sorted(m.uci() for m in board.legal_moves)
+                self.set_value(moves[ply % len(moves)], key='user_move_white')
+                if not await self.step('move', self.rerun(click_key='make_move_white')):
+                    return self
+                if args.undo_every and (ply + 1) % args.undo_every == 0:
+                    if not await self.step('undo', self.rerun(click_label='Undo Move')):
+                        return self
+        except Exception as e:
+            self.errors.append(f"session: {type(e).__name__}: {e}")
+        return self
+
+
+def percentile_ms(values, pct):
+    if not values:
+        return 0.0
+    return values[min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)] * 1000
+
+
+async def run_level(concurrency, server, args):
+    rss_before = server.rss_kb()
+    cpu_before = server.cpu_seconds()
+    start = time.perf_counter()
+    sessions = [SimulatedSession(i, server.url, args) for i in range(concurrency)]
+    await asyncio.gather(*(s.run() for s in sessions))
+    elapsed = time.perf_counter() - start
+    cpu = server.cpu_seconds() - cpu_before
+    # Sample memory while every session is still connected and holding its state
+    rss_after = server.rss_kb()
+    await asyncio.gather(*(s.close() for s in sessions))
+
+    latencies = sorted(latency for s in sessions for _, latency in s.latencies)
+    by_step = {}
+    for s in sessions:
+        for label, latency in s.latencies:
+            by_step.setdefault(label, []).append(latency)
+
+    return {
+        'concurrency': concurrency,
+        'reruns': len(latencies),
+        'errors': [e for s in sessions for e in s.errors],
+        'wall_s': elapsed,
+        'reruns_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile_ms(latencies, 50),
+        'p90_ms': percentile_ms(latencies, 90),
+        'p99_ms': percentile_ms(latencies, 99),
+        'server_cpu_s': cpu,
+        'server_cpu_utilization': cpu / elapsed if elapsed else 0.0,
+        'server_cpu_ms_per_rerun': cpu / len(latencies) * 1000 if latencies else 0.0,
+        'server_rss_kb': rss_after,
+        'server_rss_delta_kb_per_session': (rss_after - rss_before) / concurrency,
+        'p50_ms_by_step': {label: percentile_ms(sorted(values), 50) for label, values in by_step.items()},
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ramp simulated Streamlit sessions against a stubbed LLM.")
+    parser.add_argument('--levels', default='1,2,4,8', help="Comma-separated concurrency levels.")
+    parser.add_argument('--moves', type=int, default=6, help="Human moves per session (each followed by an AI reply).")
+    parser.add_argument('--undo-every', type=int, default=4, help="Undo after every N moves (0 disables).")
+    parser.add_argument('--no-suggestions', dest='suggestions', action='store_false',
+                        help="Do not request AI suggestions.")
+    parser.add_argument('--latency', default='fixed:0.05', help="Stub LLM latency spec (see groq_stub_server.py).")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--illegal-rate', type=float, default=0.0)
+    parser.add_argument('--api-key', default='load-test-key')
+    parser.add_argument('--port', type=int, default=None, help="Port for the Streamlit server (default: any free port).")
+    parser.add_argument('--rerun-timeout', type=float, default=120.0, help="Seconds before a rerun is abandoned.")
+    parser.add_argument('--output', help="Write results as JSON to this path.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    stub = StubConfig(latency=args.latency, rate_limit_rate=args.rate_limit_rate, illegal_rate=args.illegal_rate)
+    stub_server, base_url = start_in_thread(stub)
+    server = ServerProcess(args.port or free_port(), dict(os.environ, GROQ_API_BASE=base_url))
+    print(f"Stub Groq API on {base_url}, Streamlit on {server.url}")
+
+    results = []
+    try:
+        server.wait_until_healthy()
+        for concurrency in (int(level) for level in args.levels.split(',')):
+            result = asyncio.run(run_level(concurrency, server, args))
+            results.append(result)
+            print(f"{concurrency:>4} sessions: {result['reruns_per_s']:7.1f} reruns/s  "
+                  f"p50 {result['p50_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+                  f"cpu {result['server_cpu_utilization']:5.0%}  "
+                  f"mem {result['server_rss_delta_kb_per_session']:8.0f} KiB/session  "
+                  f"errors {len(result['errors'])}")
+    finally:
+        server.stop()
+        stub_server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': vars(args), 'stub_counters': stub.counters, 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+from collections import deque
+
+import chess
+
+from ranker import PIECE_VALUES
+
+# Model ids from the models endpoint that cannot play chess (speech, moderation, embeddings)
+NON_CHAT_MARKERS = ('whisper', 'tts', 'guard', 'embed')
+
+# Highest rolling illegal-move rate a model may have and still be chosen, per kind of request
+QUALITY_THRESHOLDS = {'Chess Playing': 0.3, 'Chess Teaching': 0.15, 'Suggestions': 0.15}
+
+# Openings are forgiving and the candidate list already filters out blunders; sharp middlegames
+# and endgames are not, so the threshold tightens as the game goes on
+PHASE_FACTORS = {'opening': 1.5, 'middlegame': 1.0, 'endgame': 0.75}
+
+# Non-pawn material (both sides, centipawns) at or below which a position counts as an endgame
+ENDGAME_MATERIAL = 2600
+
+
+def game_phase(board):
+    material = sum(
+        len(board.pieces(piece_type, color)) * PIECE_VALUES[piece_type]
+        for color in chess.COLORS
+        for piece_type in (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN)
+    )
+    if material <= ENDGAME_MATERIAL:
+        return 'endgame'
+    if board.fullmove_number <= 10:
+        return 'opening'
+    return 'middlegame'
+
+
+def moves_to_go(board):
+    """Rough number of moves the side to move still has to make, used to budget its clock."""
+    return max(40 - board.fullmove_number, 15)
+
+
+def chat_models(models):
+    return [m for m in models if not any(marker in m.lower() for marker in NON_CHAT_MARKERS)]
+
+
+class ModelStats:
+    """Rolling window of one model's recent requests."""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.errors = deque(maxlen=window)
+        self.illegal = deque(maxlen=window)
+        self.cooldown_until = 0.0
+
+    def record(self, latency, error=False, legal=True):
+        self.errors.append(error)
+        if error:
+            return
+        self.latencies.append(latency)
+        self.illegal.append(not legal)
+
+    def reset(self):
+        self.latencies.clear()
+        self.errors.clear()
+        self.illegal.clear()
+
+    @property
+    def samples(self):
+        return len(self.errors)
+
+    @property
+    def error_rate(self):
+        return sum(self.errors) / len(self.errors) if self.errors else 0.0
+
+    @property
+    def illegal_rate(self):
+        return sum(self.illegal) / len(self.illegal) if self.illegal else 0.0
+
+    def latency(self, pct=50):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class ModelRouter:
+    """
+    Chooses a model per request from rolling measurements of each model's latency,
+    error rate and illegal-move rate.
+
+    The fastest model (by p90 latency) whose illegal-move rate is within the threshold for
+    the mode and game phase wins. Under clock pressure, models too slow for the per-move time
+    budget are passed over if anything faster qualifies. A model whose error rate crosses
+    `max_error_rate` is benched for `cooldown` seconds and then re-measured from scratch.
+    Models without enough samples yet are tried first, so every model gets measured, and a
+    small fraction of requests goes to a random model to keep the measurements current.
+    """
+
+    def __init__(self, models, window=20, min_samples=3, max_error_rate=0.3, cooldown=60.0,
+                 explore_rate=0.05, seed=None):
+        if not models:
+            raise ValueError("ModelRouter needs at least one model.")
+        self.models = list(models)
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.explore_rate = explore_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {model: ModelStats(window) for model in self.models}
+
+    def record(self, model, latency, error=False, legal=True):
+        with self.lock:
+            stats = self.stats[model]
+            stats.record(latency, error=error, legal=legal)
+            if (error and stats.samples >= self.min_samples
+                    and stats.error_rate > self.max_error_rate):
+                stats.cooldown_until = time.monotonic() + self.cooldown
+                stats.reset()
+
+    def available(self, exclude=()):
+        now = time.monotonic()
+        models = [m for m in self.models if m not in exclude and self.stats[m].cooldown_until <= now]
+        if models:
+            return models
+        # Everything is benched or excluded: fall back to whichever comes off the bench first
+        candidates = [m for m in self.models if m not in exclude] or self.models
+        return [min(candidates, key=lambda m: self.stats[m].cooldown_until)]
+
+    def p90(self, model):
+        latency = self.stats[model].latency(90)
+        return latency if latency is not None else float('inf')
+
+    def choose(self, board, mode, time_left=None, exclude=()):
+        """Pick the model for the next request. `exclude` holds models that already failed this request."""
+        with self.lock:
+            models = self.available(exclude)
+            untried = [m for m in models if self.stats[m].samples < self.min_samples]
+            if untried:
+                return untried[0]
+            if len(models) > 1 and self.rng.random() < self.explore_rate:
+                # Re-measure a model now and then; provider latency drifts through the day
+                return self.rng.choice(models)
+            measured = models
+
+            threshold = QUALITY_THRESHOLDS.get(mode, QUALITY_THRESHOLDS['Chess Playing'])
+            threshold *= PHASE_FACTORS[game_phase(board)]
+            good = [m for m in measured if self.stats[m].illegal_rate <= threshold]
+            if not good:
+                # Nobody meets the bar: the most accurate model is the best bet
+                return min(measured, key=lambda m: (self.stats[m].illegal_rate, self.p90(m)))
+
+            if time_left:
+                budget = time_left / moves_to_go(board)
+                in_budget = [m for m in good if self.p90(m) <= budget]
+                good = in_budget or good
+            return min(good, key=self.p90)
+
+    def report(self):
+        """Current measurements per model, for display."""
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    'model': model,
+                    'samples': stats.samples,
+                    'p50_s': stats.latency(50),
+                    'p90_s': stats.latency(90),
+                    'error_rate': stats.error_rate,
+                    'illegal_rate': stats.illegal_rate,
+                    'benched_s': max(stats.cooldown_until - now, 0.0),
+                }
+                for model, stats in self.stats.items()
+            ]
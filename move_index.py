@@ -0,0 +1,115 @@
+import chess
+
+LOOSE_STRIP = str.maketrans('', '', '+#!?x:=-')
+
+
+def loose_san(text):
+    """
+    Normalize a SAN-like string so common variants map to the same key:
+    'Nxf3+', 'Nf3', 'nf3' and 'N:f3' all become 'Nf3'; 'e8=Q' and 'e8q' become 'e8Q';
+    '0-0' and 'o-o' become 'OO'.
+    """
+    key = text.strip().translate(LOOSE_STRIP)
+    if key.upper() in ('OO', '00', 'OOO', '000'):
+        return key.upper().replace('0', 'O')
+    if key and key[0] in 'nrqk':
+        key = key[0].upper() + key[1:]
+    if len(key) > 2 and key[-1] in 'nbrq' and key[-2].isdigit():
+        key = key[:-1] + key[-1].upper()
+    return key
+
+
+class MoveIndex:
+    """
+    Everything derived from the legal moves of one position, computed once per ply.
+    Maps UCI, SAN and loose SAN spellings to Move objects and keeps the strings used in prompts.
+    The SAN maps are only built on the first lookup that needs them, since most answers are UCI.
+    """
+
+    def __init__(self, board):
+        self.board = board.copy(stack=False)
+        self.turn = board.turn
+        self.moves = list(board.legal_moves)
+        self.by_uci = {}
+        self.uci_moves = []
+        for move in self.moves:
+            uci = move.uci()
+            self.uci_moves.append(uci)
+            self.by_uci[uci] = move
+            if move.promotion == chess.QUEEN:
+                # 'e7e8' without a piece letter means the usual queen promotion
+                self.by_uci.setdefault(uci[:4], move)
+        self._by_san = None
+        self._by_loose = None
+        # Filled by ranker.rank_moves, keyed by search depth
+        self.rankings = {}
+        self.legal_moves_str = ', '.join(self.uci_moves)
+        self.board_str = '\n'.join(' '.join(row) for row in board_matrix(board))
+
+    def _build_san_maps(self):
+        self._by_san = {}
+        self._by_loose = {}
+        for move in self.moves:
+            san = self.board.san(move)
+            self._by_san[san] = move
+            self._by_loose.setdefault(loose_san(san), move)
+
+    @property
+    def by_san(self):
+        if self._by_san is None:
+            self._build_san_maps()
+        return self._by_san
+
+    @property
+    def by_loose(self):
+        if self._by_loose is None:
+            self._build_san_maps()
+        return self._by_loose
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __contains__(self, move):
+        return move is not None and self.by_uci.get(move.uci()) == move
+
+    def lookup(self, text):
+        """Return the legal Move for a UCI or SAN string, or None if it is not a legal move here."""
+        if not text:
+            return None
+        text = text.strip()
+        move = self.by_uci.get(text) or self.by_san.get(text)
+        if move:
+            return move
+        move = self.by_uci.get(text.lower()) or self.by_loose.get(loose_san(text))
+        if move:
+            return move
+        if text[:1] == 'b':
+            # A lowercase 'b' may be a bishop rather than the b-pawn
+            move = self.by_loose.get(loose_san('B' + text[1:]))
+            if move:
+                return move
+        try:
+            # Rare spellings such as long algebraic 'Ng1-f3' are left to python-chess
+            move = self.board.parse_san(text)
+        except ValueError:
+            return None
+        return move if move in self else None
+
+
+def board_matrix(board):
+    """
+    Returns the board as a list of rows, top rank first.
+    Each piece is represented by 'wP', 'bK', etc., and empty squares as '__'.
+    """
+    matrix = []
+    for rank in range(7, -1, -1):
+        row = []
+        for file in range(8):
+            piece = board.piece_at(chess.square(file, rank))
+            if piece is None:
+                row.append('__')
+            else:
+                color = 'w' if piece.color == chess.WHITE else 'b'
+                row.append(f"{color}{piece.symbol().upper()}")
+        matrix.append(row)
+    return matrix
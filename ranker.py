@@ -0,0 +1,172 @@
+import chess
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0,
+}
+
+# Piece-square tables from White's point of view, written rank 8 first so they read like a board
+PIECE_SQUARE_TABLES = {
+    chess.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    chess.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    chess.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+
+MATE_SCORE = 100000
+QUIESCENCE_DEPTH = 4
+
+# Combined material + placement value per (color, piece type, square), so evaluation is one lookup per piece
+_SQUARE_VALUES = {}
+for _piece_type, _table in PIECE_SQUARE_TABLES.items():
+    for _square in chess.SQUARES:
+        _value = PIECE_VALUES[_piece_type]
+        _SQUARE_VALUES[(chess.WHITE, _piece_type, _square)] = _value + _table[chess.square_mirror(_square)]
+        _SQUARE_VALUES[(chess.BLACK, _piece_type, _square)] = -(_value + _table[_square])
+
+
+def evaluate(board):
+    """Static evaluation in centipawns from the side to move's point of view."""
+    score = 0
+    for color in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                score += _SQUARE_VALUES[(color, piece_type, square)]
+    return score if board.turn == chess.WHITE else -score
+
+
+def _capture_order(board, move):
+    victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+    attacker = board.piece_type_at(move.from_square)
+    return PIECE_VALUES[victim] * 10 - PIECE_VALUES[attacker]
+
+
+def quiescence(board, alpha, beta, depth=QUIESCENCE_DEPTH):
+    """Resolve captures so a position is not scored in the middle of an exchange."""
+    stand_pat = evaluate(board)
+    if stand_pat >= beta or depth == 0:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+    captures = sorted(board.generate_legal_captures(), key=lambda m: _capture_order(board, m), reverse=True)
+    for move in captures:
+        board.push(move)
+        score = -quiescence(board, -beta, -alpha, depth - 1)
+        board.pop()
+        if score >= beta:
+            return score
+        alpha = max(alpha, score)
+    return alpha
+
+
+def search(board, depth, alpha, beta, ply=1):
+    """Negamax alpha-beta search returning centipawns from the side to move's point of view."""
+    if board.is_checkmate():
+        return -MATE_SCORE + ply
+    if board.is_stalemate() or board.is_insufficient_material():
+        return 0
+    if depth == 0:
+        return quiescence(board, alpha, beta)
+    best = -MATE_SCORE
+    for move in board.legal_moves:
+        board.push(move)
+        score = -search(board, depth - 1, -beta, -alpha, ply + 1)
+        board.pop()
+        if score > best:
+            best = score
+        if best > alpha:
+            alpha = best
+        if alpha >= beta:
+            break
+    return best
+
+
+def rank_moves(move_index, depth=1):
+    """
+    Score every legal move of the indexed position with a shallow search and return
+    [(move, centipawns), ...] best first. Results are kept on the MoveIndex, so a
+    position is only ranked once per ply and depth.
+    """
+    if depth in move_index.rankings:
+        return move_index.rankings[depth]
+    board = move_index.board.copy(stack=False)
+    scored = []
+    for move in move_index.moves:
+        board.push(move)
+        # Each root move gets a full window so its score is exact rather than a bound
+        score = -search(board, depth - 1, -MATE_SCORE, MATE_SCORE)
+        board.pop()
+        scored.append((move, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    move_index.rankings[depth] = scored
+    return scored
+
+
+def format_score(centipawns):
+    if abs(centipawns) >= MATE_SCORE - 1000:
+        return "mate" if centipawns > 0 else "mated"
+    return f"{centipawns / 100:+.2f}"
+
+
+def candidates_str(ranked, k):
+    """Prompt line for the top-k ranked moves, e.g. 'e2e4 (+0.35), d2d4 (+0.30)'."""
+    return ', '.join(f"{move.uci()} ({format_score(score)})" for move, score in ranked[:k])
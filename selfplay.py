@@ -0,0 +1,149 @@
+"""
+Headless AI-vs-AI self-play runner.
+
+Plays many games in parallel on a process pool and streams each finished game to a PGN file.
+
+    python selfplay.py --games 100 --workers 8 --white fake --black local --output games.pgn
+    python selfplay.py --games 10 --white llm --black llm --model llama-3.1-8b-instant
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import chess
+
+from chess_game import ChessGame
+from headless import HeadlessStreamlit
+
+MOVE_SOURCES = ('llm', 'fake', 'local')
+
+
+class LocalMoveSource:
+    """Move source that never calls a model; used as a baseline and for pure engine load tests."""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.stats = {'requests': 0, 'invalid_moves': 0, 'errors': 0, 'fallbacks': 0, 'endgame_moves': 0}
+
+    def get_ai_move(self, board, color, mode, move_index=None):
+        moves = sorted(move_index.moves if move_index else board.legal_moves, key=lambda m: m.uci())
+        return self.rng.choice(moves), None
+
+
+def make_move_source(kind, st, args, seed):
+    if kind == 'local':
+        return LocalMoveSource(seed)
+    from ai_module import AIModule
+    if kind == 'fake':
+        from fake_llm import FakeLLM
+        llm = FakeLLM(
+            latency=args.latency,
+            illegal_rate=args.illegal_rate,
+            malformed_rate=args.malformed_rate,
+            seed=seed,
+        )
+        return AIModule(st, llm=llm)
+    return AIModule(st, model=args.model, base_url=args.base_url)
+
+
+def play_game(game_number, args):
+    """Play one game to completion. Runs inside a worker process."""
+    logging.disable(logging.CRITICAL)
+    st = HeadlessStreamlit(keep_messages=False)
+    seed = args.seed + game_number
+    sources = {
+        chess.WHITE: make_move_source(args.white, st, args, seed * 2),
+        chess.BLACK: make_move_source(args.black, st, args, seed * 2 + 1),
+    }
+    game = ChessGame(st)
+    game.player_white = f"{args.white} (White)"
+    game.player_black = f"{args.black} (Black)"
+    game.player_white_type = game.player_black_type = 'AI'
+    game.game_started = True
+
+    start = time.perf_counter()
+    board = game.board
+    while not board.is_game_over(claim_draw=True) and len(game.move_history) < args.max_plies:
+        move, _ = sources[board.turn].get_ai_move(board, board.turn, args.mode, move_index=game.get_move_index())
+        game.make_move(move)
+    duration = time.perf_counter() - start
+
+    stats = {key: sources[chess.WHITE].stats[key] + sources[chess.BLACK].stats[key]
+             for key in sources[chess.WHITE].stats}
+    llm_moves = sum(len(game.move_history[i::2]) for i, kind in enumerate((args.white, args.black))
+                    if kind != 'local')
+    return {
+        'game': game_number,
+        'pgn': game.export_pgn(),
+        'plies': len(game.move_history),
+        'result': board.result(claim_draw=True),
+        'duration': duration,
+        'stats': stats,
+        'llm_moves': llm_moves,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Play AI-vs-AI games headlessly on a process pool.")
+    parser.add_argument('--games', type=int, default=10, help="Number of games to play.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument('--white', choices=MOVE_SOURCES, default='fake', help="Move source for White.")
+    parser.add_argument('--black', choices=MOVE_SOURCES, default='fake', help="Move source for Black.")
+    parser.add_argument('--model', default="llama-3.1-8b-instant", help="Groq model used by the 'llm' source.")
+    parser.add_argument('--base-url', default=os.environ.get('GROQ_API_BASE'),
+                        help="Groq API base URL for the 'llm' source, e.g. a local groq_stub_server.py.")
+    parser.add_argument('--mode', choices=('Chess Playing', 'Chess Teaching'), default='Chess Playing')
+    parser.add_argument('--max-plies', type=int, default=300, help="Adjourn games that run longer than this.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake LLM latency in seconds.")
+    parser.add_argument('--illegal-rate', type=float, default=0.0, help="Fake LLM illegal-move rate.")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Fake LLM malformed-output rate.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='selfplay.pgn', help="PGN file finished games are appended to.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    totals = {'requests': 0, 'invalid_moves': 0, 'errors': 0, 'fallbacks': 0, 'endgame_moves': 0}
+    results = {}
+    plies = 0
+    llm_moves = 0
+
+    start = time.perf_counter()
+    with open(args.output, 'a') as pgn_file, ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(play_game, n, args) for n in range(args.games)]
+        for done, future in enumerate(as_completed(futures), 1):
+            outcome = future.result()
+            pgn_file.write(outcome['pgn'] + "\n\n")
+            pgn_file.flush()
+            plies += outcome['plies']
+            llm_moves += outcome['llm_moves']
+            results[outcome['result']] = results.get(outcome['result'], 0) + 1
+            for key in totals:
+                totals[key] += outcome['stats'][key]
+            print(f"[{done}/{args.games}] game {outcome['game']}: {outcome['result']} "
+                  f"in {outcome['plies']} plies ({outcome['duration']:.2f}s)")
+    elapsed = time.perf_counter() - start
+
+    answered = totals['requests'] - totals['errors']
+    print("\nSummary")
+    print(f"  games/s:        {args.games / elapsed:.2f} ({args.games} games in {elapsed:.1f}s)")
+    print(f"  average plies:  {plies / max(args.games, 1):.1f}")
+    print(f"  results:        {', '.join(f'{k}: {v}' for k, v in sorted(results.items()))}")
+    if totals['requests']:
+        print(f"  legality rate:  {(answered - totals['invalid_moves']) / max(answered, 1):.1%} "
+              f"of {answered} model answers")
+        print(f"  error rate:     {totals['errors'] / totals['requests']:.1%} of {totals['requests']} requests")
+    if llm_moves:
+        print(f"  fallback rate:  {totals['fallbacks'] / llm_moves:.1%} of {llm_moves} model moves")
+        print(f"  table moves:    {totals['endgame_moves'] / llm_moves:.1%} answered from endgame tables")
+    print(f"  PGN written to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Simultaneous exhibitions: one human against the AI on many boards at once.
+
+AI moves for every board waiting on the AI are handed to a thread pool together, so the
+requests run concurrently instead of one blocking call per rerun. Results are only applied to
+the games from the session's own script run (`Simul.step`), never from the worker threads.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+
+from chess_game import ChessGame
+
+MAX_BOARDS = 16
+MAX_WORKERS = 8
+
+
+class SimulScheduler:
+    """Runs AI moves for many boards concurrently, at most one in flight per board."""
+
+    def __init__(self, ai_module, workers=MAX_WORKERS):
+        self.ai_module = ai_module
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='simul')
+        self.pending = {}
+
+    def submit_all(self, requests, mode='Chess Playing'):
+        """Start an AI move for each (board id, board) not already waiting on one."""
+        submitted = 0
+        for board_id, board in requests:
+            if board_id in self.pending:
+                continue
+            # Each request gets its own copy of the module and board, so workers share nothing mutable
+            worker = self.ai_module.headless_copy()
+            position = board.copy()
+            future = self.pool.submit(worker.get_ai_move, position, position.turn, mode)
+            self.pending[board_id] = (len(board.move_stack), future)
+            submitted += 1
+        if submitted:
+            logging.info(f"Simul: {submitted} AI moves submitted, {len(self.pending)} in flight")
+        return submitted
+
+    def is_pending(self, board_id):
+        return board_id in self.pending
+
+    def done(self):
+        """(board id, ply the move was computed for, move) for every finished request, removing them."""
+        finished = []
+        for board_id, (ply, future) in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[board_id]
+            try:
+                move, _ = future.result()
+            except Exception as e:
+                logging.error(f"Simul: AI move for board {board_id} failed: {e}")
+                continue
+            finished.append((board_id, ply, move))
+        return finished
+
+    def any_done(self):
+        return any(future.done() for _, future in self.pending.values())
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class Simul:
+    """N games between one human side and the AI, with their AI moves scheduled together."""
+
+    def __init__(self, st, ai_module, boards, human_color=chess.WHITE, player_name='Human', mode='Chess Playing'):
+        self.st = st
+        self.human_color = human_color
+        self.player_name = player_name
+        self.mode = mode
+        self.games = []
+        for _ in range(min(max(boards, 1), MAX_BOARDS)):
+            game = ChessGame(st)
+            human_white = human_color == chess.WHITE
+            game.player_white_type = 'Human' if human_white else 'AI'
+            game.player_black_type = 'AI' if human_white else 'Human'
+            game.player_white = player_name if human_white else 'AI'
+            game.player_black = 'AI' if human_white else player_name
+            game.game_started = True
+            self.games.append(game)
+        self.scheduler = SimulScheduler(ai_module, workers=min(len(self.games), MAX_WORKERS))
+
+    def ai_to_move(self, game):
+        return game.board.turn != self.human_color and not game.board.is_game_over(claim_draw=True)
+
+    def human_to_move(self, board_id):
+        game = self.games[board_id]
+        return (game.board.turn == self.human_color and not game.board.is_game_over(claim_draw=True)
+                and not self.scheduler.is_pending(board_id))
+
+    def step(self):
+        """Apply finished AI moves, then schedule every board now waiting on the AI. Called once per rerun."""
+        for board_id, ply, move in self.scheduler.done():
+            game = self.games[board_id]
+            # Skip a stale answer if the board changed while the AI was thinking
+            if len(game.board.move_stack) == ply and move in game.board.legal_moves:
+                game.make_move(move)
+        self.scheduler.submit_all(
+            [(i, game.board) for i, game in enumerate(self.games) if self.ai_to_move(game)], self.mode
+        )
+
+    def play(self, board_id, move):
+        """Play the human's move on one board and schedule the AI's reply right away."""
+        game = self.games[board_id]
+        if not self.human_to_move(board_id) or move not in game.board.legal_moves:
+            return False
+        game.make_move(move)
+        if self.ai_to_move(game):
+            self.scheduler.submit_all([(board_id, game.board)], self.mode)
+        return True
+
+    def results(self):
+        return [game.board.result(claim_draw=True) if game.board.is_game_over(claim_draw=True) else None
+                for game in self.games]
+
+    def score(self):
+        """Points for the human side so far, and the number of finished games."""
+        points, finished = 0.0, 0
+        human_win = '1-0' if self.human_color == chess.WHITE else '0-1'
+        for result in self.results():
+            if result is None:
+                continue
+            finished += 1
+            points += 1.0 if result == human_win else 0.5 if result == '1/2-1/2' else 0.0
+        return points, finished
@@ -0,0 +1,70 @@
+import logging
+
+import chess
+
+from game_ui import GameUI
+
+
+class SimulUI(GameUI):
+    """
+    Grid of small boards for a simultaneous exhibition. Moves are played by clicking the
+    boards; the AI's replies arrive in the background and a short polling fragment reruns the
+    page as soon as any of them is ready, so no board ever waits on another.
+    """
+
+    COLUMNS = 4
+    BOARD_SIZE = 220
+    POLL_SECONDS = 0.5
+
+    def __init__(self, simul, ai_module, st):
+        super().__init__(game=None, ai_module=ai_module, st=st)
+        self.simul = simul
+
+    def render(self):
+        self.render_header()
+        self.simul.step()
+        points, finished = self.simul.score()
+        total = len(self.simul.games)
+        self.st.write(f"### Simultaneous Exhibition: {self.simul.player_name} vs AI on {total} boards")
+        self.st.markdown(f"**Score:** {points:g} / {finished} finished, {total - finished} in play")
+
+        waiting = [i for i in range(total) if self.simul.human_to_move(i)]
+        if waiting:
+            self.st.caption("Your move on board " + ", ".join(str(i + 1) for i in waiting))
+        results = self.simul.results()
+        for row_start in range(0, total, self.COLUMNS):
+            columns = self.st.columns(self.COLUMNS)
+            for board_id in range(row_start, min(row_start + self.COLUMNS, total)):
+                with columns[board_id - row_start]:
+                    self.render_simul_board(board_id, results[board_id])
+
+        if self.simul.scheduler.pending:
+            self.poll()
+
+    def render_simul_board(self, board_id, result):
+        game = self.simul.games[board_id]
+        board = game.board
+        if result:
+            status = f"Result {result}"
+        elif self.simul.human_to_move(board_id):
+            status = "**Your move**"
+        else:
+            status = "AI is thinking..."
+        self.st.markdown(f"Board {board_id + 1} · move {board.fullmove_number} · {status}")
+        clicked = self.board_component(f'simul_{board_id}').render(
+            board, interactive=self.simul.human_to_move(board_id), size=self.BOARD_SIZE,
+            orientation='white' if self.simul.human_color == chess.WHITE else 'black'
+        )
+        if clicked:
+            move = game.get_move_index().lookup(clicked)
+            if move and self.simul.play(board_id, move):
+                self.st.rerun()
+            logging.warning(f"Simul: illegal move clicked on board {board_id + 1}: {clicked}")
+
+    def poll(self):
+        @self.st.fragment(run_every=self.POLL_SECONDS)
+        def wait_for_ai():
+            if self.simul.scheduler.any_done():
+                self.st.rerun()
+
+        wait_for_ai()
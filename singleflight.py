@@ -0,0 +1,128 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+The first caller for a key (the leader) makes the request; callers arriving with the same key
+while it is in flight attach to it and get the same result, or the same exception. Streamed
+text is relayed to followers as it arrives. Nothing is kept once the request finishes, so this
+only merges concurrent duplicates and is not a cache.
+"""
+import logging
+import threading
+
+
+class Flight:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.text = ""
+        self.done = False
+        self.result = None
+        self.error = None
+        # Set when the leader was interrupted (e.g. a Streamlit rerun) rather than the request failing
+        self.abandoned = False
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.stats = {'leaders': 0, 'coalesced': 0, 'abandoned': 0}
+
+    def do(self, key, fn, on_text=None):
+        """
+        Run `fn(publish)` once per key at a time and return its result to every caller.
+        `publish(text_so_far)` relays streamed text, and is None when the leader did not ask for it.
+        If the leader is interrupted, its followers elect a new leader and make the request again.
+        """
+        while True:
+            with self.lock:
+                flight = self.flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self.flights[key] = Flight()
+                    self.stats['leaders'] += 1
+                else:
+                    flight.followers += 1
+                    self.stats['coalesced'] += 1
+            if leader:
+                return self.lead(key, flight, fn, on_text)
+            logging.info(f"Coalesced with an in-flight request ({key[0]}, {key[1]})")
+            finished, result = self.follow(flight, on_text)
+            if finished:
+                return result
+            logging.info(f"Leader of an in-flight request ({key[0]}, {key[1]}) was interrupted; retrying")
+
+    def lead(self, key, flight, fn, on_text):
+        interrupted = []
+
+        def publish(text):
+            with flight.cond:
+                flight.text = text
+                flight.cond.notify_all()
+            if interrupted:
+                return
+            try:
+                on_text(text)
+            except BaseException as e:
+                # The leader's own page went away (e.g. a rerun). Finish the call for the
+                # sessions waiting on it, unless nobody is, and raise once it is done.
+                with self.lock:
+                    followers = flight.followers
+                if not followers:
+                    raise
+                interrupted.append(e)
+
+        try:
+            flight.result = fn(publish if on_text else None)
+        except Exception as e:
+            flight.error = e
+            raise
+        except BaseException:
+            flight.abandoned = True
+            self.stats['abandoned'] += 1
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+        if interrupted:
+            raise interrupted[0]
+        return flight.result
+
+    @staticmethod
+    def follow(flight, on_text):
+        """(True, result) once the leader finishes, or (False, None) if it was interrupted."""
+        seen = ""
+        while True:
+            with flight.cond:
+                while not flight.done and flight.text == seen:
+                    flight.cond.wait()
+                text, done = flight.text, flight.done
+            if done and flight.abandoned:
+                return False, None
+            # Callbacks run outside the lock so a slow viewer never holds up the leader
+            if on_text and text != seen:
+                on_text(text)
+            seen = text
+            if done:
+                break
+        if flight.error is not None:
+            raise flight.error
+        if on_text and flight.result != seen:
+            on_text(flight.result)
+        return True, flight.result
+
+
+_shared_flights = None
+_shared_flights_lock = threading.Lock()
+
+
+def shared_flights():
+    """One SingleFlight per process, so identical requests from different sessions are merged."""
+    global _shared_flights
+    with _shared_flights_lock:
+        if _shared_flights is None:
+            _shared_flights = SingleFlight()
+    return _shared_flights
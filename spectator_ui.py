@@ -0,0 +1,77 @@
+import base64
+import uuid
+
+from broadcast import shared_hub
+from game_ui import GameUI
+
+
+class SpectatorUI(GameUI):
+    """
+    Read-only view of a broadcast. Everything is drawn from the broadcast's shared snapshot,
+    so watching never calls the LLM. A small fragment polls for new moves and only reruns
+    the page when one has been published.
+    """
+
+    POLL_SECONDS = 1.0
+
+    def __init__(self, st):
+        super().__init__(game=None, ai_module=None, st=st)
+        self.viewer_id = uuid.uuid4().hex
+        self.seen_version = None
+
+    def render(self, broadcast_id):
+        self.render_header()
+        broadcast = shared_hub().get(broadcast_id)
+        if broadcast is None:
+            self.st.error("This broadcast does not exist (any more).")
+            self.render_live_list()
+            return
+        snapshot = broadcast.snapshot
+        self.seen_version = snapshot['version']
+        broadcast.touch(self.viewer_id)
+
+        main_col, side_col = self.st.columns([3, 2])
+        with main_col:
+            self.st.markdown(f"**AI (White) vs AI (Black)** · broadcast `{broadcast.id}`")
+            self.render_eval_bar(snapshot['eval_series'][-1])
+            self.board_component('broadcast').render(snapshot['board'])
+            if snapshot['explanation']:
+                self.st.markdown(f"**Commentary:** {snapshot['explanation']}")
+            self.render_eval_graph(snapshot['eval_series'])
+        with side_col:
+            self.st.write("### Move History")
+            self.st.markdown(snapshot['history_html'], unsafe_allow_html=True)
+            if snapshot['status'] == 'live':
+                if broadcast.id in self.st.session_state.get('hosted_broadcasts', ()):
+                    if self.st.button("Stop Broadcast", key="stop_broadcast"):
+                        broadcast.stop()
+                        self.st.rerun()
+                self.watch(broadcast)
+            else:
+                self.st.write("### 🏁 Game Over")
+                self.st.write(f"**Result:** {snapshot['result'] or 'Broadcast stopped.'}")
+                if snapshot['pgn']:
+                    b64_pgn = base64.b64encode(snapshot['pgn'].encode()).decode()
+                    self.st.markdown(
+                        f'<a href="data:text/plain;base64,{b64_pgn}" download="broadcast.pgn">Download the PGN</a>',
+                        unsafe_allow_html=True
+                    )
+
+    def watch(self, broadcast):
+        @self.st.fragment(run_every=self.POLL_SECONDS)
+        def poll():
+            broadcast.touch(self.viewer_id)
+            self.st.caption(f"🔴 Live · {broadcast.viewers} watching")
+            if broadcast.version != self.seen_version:
+                self.st.rerun()
+
+        poll()
+
+    def render_live_list(self):
+        live = shared_hub().live()
+        if not live:
+            return
+        self.st.write("### Live Games")
+        for broadcast in live:
+            self.st.markdown(f"- [{broadcast.id}](?watch={broadcast.id}) · move {broadcast.snapshot['plies'] // 2 + 1}, "
+                             f"{broadcast.viewers} watching")
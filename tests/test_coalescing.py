@@ -0,0 +1,51 @@
+import threading
+import time
+
+import chess
+
+from ai_module import AIModule
+from fake_llm import FakeLLM
+from headless import HeadlessStreamlit
+
+
+class CountingClient:
+    """A separate client per AIModule, like ChatGroq, that counts requests across all of them."""
+
+    calls = []
+
+    def __init__(self, api_key):
+        self.fake = FakeLLM(seed=1)
+        self.api_key = api_key
+
+    def invoke(self, messages):
+        CountingClient.calls.append(self.api_key)
+        time.sleep(0.2)
+        return self.fake.invoke(messages)
+
+
+def play_concurrently(monkeypatch, api_keys):
+    monkeypatch.setattr(AIModule, 'create_llm', lambda self, model: CountingClient(self.api_key))
+    CountingClient.calls = []
+    modules = [AIModule(HeadlessStreamlit(), api_key=key, use_endgame_tables=False) for key in api_keys]
+    moves = [None] * len(modules)
+
+    def play(i):
+        moves[i], _ = modules[i].get_ai_move(chess.Board(), chess.WHITE, 'Chess Playing', max_retries=1)
+
+    threads = [threading.Thread(target=play, args=(i,)) for i in range(len(modules))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return moves
+
+
+def test_sessions_with_the_same_key_share_one_request(monkeypatch):
+    moves = play_concurrently(monkeypatch, ['key-a'] * 4)
+    assert len(CountingClient.calls) == 1
+    assert len(set(moves)) == 1
+
+
+def test_sessions_with_different_keys_are_not_merged(monkeypatch):
+    play_concurrently(monkeypatch, ['key-a', 'key-b'])
+    assert sorted(CountingClient.calls) == ['key-a', 'key-b']
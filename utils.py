@@ -1,8 +1,12 @@
 import base64
+import html
 import os
-def set_custom_css(self=None):
-    self.st.markdown(
-        """
+
+import chess
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "logo.png")
+
+CUSTOM_CSS = """
         <style>
         /* Set the background color */
         body {
@@ -94,6 +98,31 @@ def set_custom_css(self=None):
             border-bottom: 1px solid #ddd;
         }
 
+        /* Evaluation bar: White's share of the bar grows with White's advantage */
+        .eval-bar {
+            display: flex;
+            height: 22px;
+            border: 1px solid #888;
+            border-radius: 4px;
+            overflow: hidden;
+            margin-bottom: 8px;
+            font-size: 0.8em;
+            font-weight: bold;
+        }
+        .eval-bar .eval-white {
+            background-color: #FFFFFF;
+            color: #000000;
+            text-align: left;
+            padding-left: 6px;
+        }
+        .eval-bar .eval-black {
+            background-color: #333333;
+            color: #FFFFFF;
+            text-align: right;
+            padding-right: 6px;
+            flex: 1;
+        }
+
         /* Custom scrollbar for move-history-table */
         .move-history-table::-webkit-scrollbar {
             width: 8px;
@@ -112,9 +141,12 @@ def set_custom_css(self=None):
             background: #555; 
         }
         </style>
-        """,
-        unsafe_allow_html=True,
-    )
+        """
+
+
+def set_custom_css(self=None):
+    self.st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
 def get_base64_image(image_path):
     """Encodes an image file to Base64."""
     try:
@@ -124,26 +156,65 @@ def get_base64_image(image_path):
     except FileNotFoundError:
         return None
 
-def display_header(self=None):
-    """Displays the header with the logo and title."""
-    logo_path = os.path.join("static", "logo.png")
-    logo_base64 = get_base64_image(logo_path)
-
+def build_header_html(logo_base64):
     if logo_base64:
-        header_html = f"""
+        return f"""
         <div class='header'>
             <img src="data:image/png;base64,{logo_base64}" width="200" alt="Logo">
             <h1>♟️ Chess Game</h1>
         </div>
         """
-        self.st.markdown(header_html, unsafe_allow_html=True)
-    else:
-        # If logo is not found, display only the title with an error message
-        header_html = """
+    # If logo is not found, display only the title with an error message
+    return """
         <div class='header'>
             <h1>♟️ Chess Game</h1>
             <p style="color: red;">Logo image not found.</p>
         </div>
         """
-        self.st.markdown(header_html, unsafe_allow_html=True)
 
+
+# The logo never changes while the server runs, so it is read and encoded once per process
+HEADER_HTML = build_header_html(get_base64_image(LOGO_PATH))
+
+
+def display_header(self=None):
+    """Displays the header with the logo and title."""
+    self.st.markdown(HEADER_HTML, unsafe_allow_html=True)
+
+
+def move_history_html(moves, starting_fen=chess.STARTING_FEN):
+    """The move history table, in SAN, for a list of UCI moves played from `starting_fen`."""
+    temp_board = chess.Board(starting_fen)
+    move_list = []
+    move_number = temp_board.fullmove_number
+    # With Black to move first (an imported FEN), the first row has an empty White cell
+    plies = ([None] if temp_board.turn == chess.BLACK else []) + list(moves)
+    move_pairs = [plies[i:i+2] for i in range(0, len(plies), 2)]
+    for pair in move_pairs:
+        white_move_san = ''
+        black_move_san = ''
+        try:
+            if len(pair) >=1 and pair[0] is not None:
+                move = chess.Move.from_uci(pair[0])
+                san_move = temp_board.san(move)
+                temp_board.push(move)
+                white_move_san = san_move
+        except ValueError:
+            white_move_san = "Invalid Move"
+        try:
+            if len(pair) == 2:
+                move = chess.Move.from_uci(pair[1])
+                san_move = temp_board.san(move)
+                temp_board.push(move)
+                black_move_san = san_move
+        except ValueError:
+            black_move_san = "Invalid Move"
+        move_list.append({'Move': move_number, 'White': white_move_san, 'Black': black_move_san})
+        move_number +=1
+    table_html = '<div class="move-history-table">'
+    table_html += '<table>'
+    table_html += '<tr><th>Move</th><th>White</th><th>Black</th></tr>'
+    for row in move_list:
+        table_html += f"<tr><td>{row['Move']}</td><td>{html.escape(row['White'])}</td><td>{html.escape(row['Black'])}</td></tr>"
+    table_html += '</table></div>'
+    return table_html